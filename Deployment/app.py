@@ -1,14 +1,11 @@
 import streamlit as st
 import streamlit.components.v1 as components
-import pandas as pd
-import numpy as np
-import pickle
-import re
-from rapidfuzz import process, fuzz
 from datetime import datetime
 from streamlit_option_menu import option_menu
 from PIL import Image
 import os
+import sys
+import threading
 import gdown
 import gspread
 from oauth2client.service_account import ServiceAccountCredentials
@@ -22,414 +19,37 @@ st.set_page_config(page_title="Movie - Game Recommendation Engine", layout="wide
 # This gets the absolute path of the current script
 BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 
-@st.cache_resource
-def load_movies():
-    file_path = os.path.join(BASE_DIR, "movies_recommended.pkl")
-    return pickle.load(open(file_path, 'rb'))
-
-@st.cache_resource
-def load_movies_matrix():
-    file_path = os.path.join(BASE_DIR, "cosine_sim.pkl")
-    return pickle.load(open(file_path, 'rb'))
+# The recommendation engine lives in the headless `recommender` package at the repository root
+sys.path.insert(0, BASE_DIR)
+from recommender import MovieRecommender, GameRecommender
 
+# One recommender per domain and process, shared by all sessions. Creating them is instant: the artifacts of a
+# domain are only loaded the first time its recommend page needs them (or by the warm-up at the end of the script),
+# so Home and Contact Me never wait for the catalogues
 @st.cache_resource
-def load_games():
-    file_path = os.path.join(BASE_DIR, "games_recommended.pkl")
-    return pickle.load(open(file_path, 'rb'))
+def load_movie_recommender():
+    return MovieRecommender(BASE_DIR)
 
 @st.cache_resource
-def load_games_matrix():
-    file_path = os.path.join(BASE_DIR, "cosine_sim.npy")
-    return np.load(file_path)
-
-# Load all
-movies = load_movies()
-movies_matrix = load_movies_matrix()
-games = load_games()
-games_matrix = load_games_matrix()
-
-# Aliases:
-movie_aliases = {
-    "znmd": "Zindagi Na Milegi Dobara",
-    "dch": "Dil Chahta Hai",
-    "3idiots": "3 Idiots",
-    "k3g": "Kabhi Khushi Kabhie Gham",
-    "lagaan": "Lagaan",
-    "dhoom": "Dhoom 3",
-    "tzp": "Taare Zameen Par",
-    "bb": "Bajrangi Bhaijaan",
-    "dangal": "Dangal",
-    "aaa": "Andaz Apna Apna",
-    "barfi": "Barfi!",
-    "mi": "Mission Impossible",
-    "tdk": "The Dark Knight",
-    "inception": "Inception",
-    "lotr": "The Lord of the Rings",
-    "matrix": "The Matrix",
-    "endgame": "Avengers: Endgame",
-    "forrest": "Forrest Gump",
-    "interstellar": "Interstellar",
-    "jp": "Jurassic Park",
-    "potc": "Pirates of the Caribbean",
-    "singham": "Singham Again",
-    "ddlj": "Dilwale Dulhania Le Jayenge",
-    "rrr": "RRR",
-    "kgf": "KGF Chapter 1",
-    "kgf2": "KGF Chapter 2",
-    "koi mil gaya": "Koi... Mil Gaya",
-    "kmg": "Koi... Mil Gaya",
-    "krish": "Krrish",
-    "bahubali": "Baahubali: The Beginning",
-    "bahubali2": "Baahubali 2: The Conclusion",
-    "bb2": "Bhool Bhulaiyaa 2",
-    "qsqt": "Qayamat Se Qayamat Tak",
-    "gadar": "Gadar: Ek Prem Katha",
-    "gadar2": "Gadar 2",
-    "sholay": "Sholay",
-    "mnik": "My Name is Khan",
-    "swades": "Swades",
-    "kites": "Kites",
-    "dostana": "Dostana",
-    "chak de": "Chak De! India",
-    "md": "Mohabbatein",
-    "rnpm": "Rab Ne Bana Di Jodi",
-    "ktkg": "Kuch Tum Kaho Kuch Hum Kahein",
-    "kkn": "Kabir Khan",
-    "tmk": "Tees Maar Khan",
-    "angry birds": "The Angry Birds Movie",
-    "angry birds 2": "The Angry Birds Movie 2",
-    "nemo": "Finding Nemo"
-}
-
-alias_dict = {
-    # GTA
-    'gta5': 'grand theft auto v',
-    'gta 5': 'grand theft auto v',
-    'gta v': 'grand theft auto v',
-    'gta': 'grand theft auto',
-    'gta 4': 'grand theft auto iv',
-    'gta4': 'grand theft auto iv',
-
-    # Witcher
-    'witcher 3': 'the witcher 3 wild hunt',
-    'tw3': 'the witcher 3 wild hunt',
-
-    # BatMan
-    'batman': 'batman arkham knight',
-
-    # Uncharted
-    'uncharted': 'uncharted drakes fortune',
-    'uncharted 4': 'uncharted 4 a thiefs end',
-    'uncharted lost': 'uncharted lost legacy',
-
-    # Test Drive
-    'test drive': 'test drive unlimited',
-
-    # Forza
-    'forza': 'forza horizon 5',
-
-    # Need for Speed
-    'nfs': 'need for speed',
-    'nfs heat': 'need for speed heat',
-    'nfs unbound': 'need for speed unbound',
-
-    # Red Dead Redemption
-    'rdr': 'red dead redemption',
-    'rdr2': 'red dead redemption 2',
-    'red dead 2': 'red dead redemption 2',
-    'red dead': 'red dead redemption 2',
-
-    # Zelda
-    'botw': 'the legend of zelda breath of the wild',
-    'zelda botw': 'the legend of zelda breath of the wild',
-
-    # Elden Ring
-    'elden': 'elden ring',
-    'elden ring': 'elden ring',
-
-    # God Of War
-    'gow': 'god of war',
-    'god of war 4': 'god of war',
-    'god of war': 'god of war',
-
-    # MineCraft
-    'minecraft': 'minecraft',
-
-    # Fortnite
-    'fortnite': 'fortnite',
-
-    # Call Of Duty
-    'cod': 'call of duty',
-    'call of duty': 'call of duty',
-
-    # Horizon
-    'hzd': 'horizon zero dawn',
-    'horizon': 'horizon zero dawn',
-
-    # Spider-Man
-    'spiderman': 'marvels spider man',
-    'spider man': 'marvels spider man',
-    'marvel spiderman': 'marvels spider man',
-
-    # CyberPunk
-    'cyberpunk': 'cyberpunk 2077',
-    'cyberpunk 2077': 'cyberpunk 2077',
-
-    # Assassin's Creed
-    'ac valhalla': 'assassins creed valhalla',
-    'assassins creed valhalla': 'assassins creed valhalla',
-    'acv': 'assassins creed valhalla',
-    'ac': 'assassins creed',
-    'ac2': 'assassins creed 2',
-
-    # Resident Evil
-    're8': 'resident evil village',
-    'resident evil 8': 'resident evil village',
-    'village': 'resident evil village',
-
-    # Last Of Us
-    'tlou': 'the last of us',
-    'tlou2': 'the last of us part ii',
-    'last of us': 'the last of us',
-    'last of us 2': 'the last of us part ii',
-
-    # Dragon Ball
-    'dragon ball': 'dragon ball z',
-    'dragon z': 'dragon ball fighterz',
-    'dbz': 'dragon ball z',
-    'dbz budokai': 'dragonal ball budokai tenkaichi',
-    'dbz sparking zero': 'dragon ball sparking zero',
-
-    # Harry Potter
-    'hogwarts': 'hogwarts legacy',
-
-    # Sekiro
-    'sekiro': 'sekiro shadows die twice',
-
-    # Call of Duty specific entries
-    "cod mw": "call of duty modern warfare",
-    "cod mw2": "call of duty modern warfare 2",
-    "cod bo": "call of duty black ops",
-    "cod bo2": "call of duty black ops ii",
-
-    # PUBG variations
-    "pubg": "playerunknowns battlegrounds",
-    "bgmi": "battlegrounds mobile india",
-
-    # Apex Legends
-    "apex": "apex legends",
-
-    # Valorant
-    "valo": "valorant",
-    "valorant": "valorant",
-
-    # CS:GO
-    "csgo": "counter strike global offensive",
-    "cs 2": "counter strike 2",
-
-    # League of Legends
-    "lol": "league of legends",
-
-    # DOTA 2
-    "dota": "dota 2",
-
-    # FIFA
-    "fifa": "fifa 23",
-
-    # PES (Pro Evolution Soccer)
-    "pes": "efootball pes 2021",
-    "efootball": "efootball 2023",
-
-    # Elder Scrolls
-    "skyrim": "the elder scrolls v skyrim",
-
-    # Diablo
-    "diablo 4": "diablo iv",
-
-    # Far Cry
-    "fc5": "far cry 5",
-    "fc6": "far cry 6",
-
-    # Hitman
-    "hitman 3": "hitman 3",
-
-    # Mass Effect
-    "me": "mass effect",
-    "me2": "mass effect 2",
+def load_game_recommender():
+    return GameRecommender(BASE_DIR)
 
-    # Bioshock
-    "bioshock": "bioshock infinite",
-
-    # Doom
-    "doom": "doom eternal",
-
-    # Star Wars
-    "jfo": "star wars jedi fallen order",
-    "survivor": "star wars jedi survivor",
-
-    # Borderlands
-    "bl3": "borderlands 3",
-
-    # Avengers
-    "avengers": "Marvel's Avengers"
-}
+# Load the artifacts of a recommender if they are not loaded yet (concurrent sessions wait for the same load):
+def loaded(recommender, message):
+    if not recommender.loaded:
+        with st.spinner(message):
+            recommender.load()
+    return recommender
 
 # ------------------------ Recommendation Functions -----------------------
 
        # ------------------------ Movies -----------------------
 def recommend_movies(user_input, top_n=10):
-    try:
-        # Validate user input
-        if not isinstance(user_input, str) or not user_input.lower().strip():
-            raise ValueError("User input must not be empty. Please add a movie to get recommendations.")
-        
-        # Clean user input
-        user_input_clean = re.sub(r'[^a-zA-Z0-9\s]', '', user_input.lower().strip())
-
-        # Use alias if available
-        if user_input_clean in movie_aliases:
-            user_input_clean = movie_aliases[user_input_clean]
-
-        # Handle case where no fuzzy match is found
-        match_result = process.extractOne(user_input_clean, movies['title_clean'].to_list(), scorer=fuzz.ratio)
-        if match_result is None:
-            raise ValueError(f"Movie {user_input} is not updated in the data. It will be added in future update of application.")
-        
-        best_match = match_result[0]
-        print(f"Best Match is: {best_match}")
-
-        # Get index of the best match
-        idx = movies[movies['title_clean'] == best_match].index[0]
-
-        # Ensure that idx is valid
-        if idx < 0 or idx >= len(movies):
-            raise IndexError(f"Index {idx} is out of range.")
-        
-        # Calculate similarity scores directly from the precomputed cosine_sim matrix
-        sim_scores = list(enumerate(movies_matrix[idx]))      # Use the precomputed cosine similarity matrix
-
-        # Sort the similarity scores (excluding the movie itself)
-        similar_movies_idx = sorted(sim_scores, key=lambda x: x[1], reverse=True)[1:top_n+1]
-
-        # Prepare results
-        results = []
-        for i, _ in similar_movies_idx:
-            movie_data = movies.loc[i]
-
-            # Check if all necessary fields exist
-            if any(field not in movie_data for field in ['title', 'top_cast','cast_profile_path', 'description', 'genres', 'languages', 'rating', 'poster_path', 'release_date', 'watch_link']):
-                continue
-
-            # Get trailer info if available:
-            video_key = movie_data.get('video_key')
-            trailer_url = f"https://www.youtube.com/watch?v={video_key}" if pd.notna(video_key) else None
-
-            results.append({
-                'Title': movies.loc[i,'title'],
-                'Top Cast': movies.loc[i, 'top_cast'],
-                'Cast Picture': movies.loc[i, 'cast_profile_path'],
-                'Description': movies.loc[i,'description'],
-                'Genre': movies.loc[i,'genres'],
-                'Language': movies.loc[i,'languages'],
-                'Release Date': movies.loc[i, 'release_date'],
-                'Rating': movies.loc[i,'rating'],
-                'Poster': movies.loc[i,'poster_path'],
-                'Stream': movies.loc[i, 'watch_link'],
-                'Trailer': trailer_url
-            })
-
-
-        return results
-    
-    except ValueError as ve:
-        return {'Error': str(ve)}
-    
-    except IndexError as ie:
-        return {'Error': f'Index error: {str(ie)}'}
-    
-    except Exception as e:
-        return {'Error': f'An unexpected error occurred: {str(e)}'}
+    return loaded(load_movie_recommender(), "Loading the movie catalogue...").recommend(user_input, top_n)
     
         # ------------------------ Games -----------------------
 def recommend_games(user_input, top_n=10):
-    try:
-        # Validate user input
-        if not isinstance(user_input, str) or not user_input.lower().strip():
-            raise ValueError("User input must not be empty. Please add a game to get recommendations.")
-        
-        # Clean user input
-        user_input_clean = re.sub(r'[^a-zA-Z0-9\s]', '', user_input.lower().strip())
-
-        # Use alias if available
-        if user_input_clean in alias_dict:
-            user_input_clean = alias_dict[user_input_clean]
-
-        # Handle case where no fuzzy match is found
-        match_result = process.extractOne(user_input_clean, games['title_clean'].to_list(), scorer=fuzz.ratio)
-        if match_result is None:
-            raise ValueError(f"Movie {user_input} is not updated in the data. It will be added in future update of application.")
-        
-        best_match = match_result[0]
-        print(f"Best Match is: {best_match}")
-
-        # Get index of the best match
-        idx = games[games['title_clean'] == best_match].index[0]
-
-        # Ensure that idx is valid
-        if idx < 0 or idx >= len(games):
-            raise IndexError(f"Index {idx} is out of range.")
-        
-        # Calculate similarity scores directly from the precomputed cosine_sim matrix
-        sim_scores = list(enumerate(games_matrix[idx]))      # Use the precomputed cosine similarity matrix
-
-        # Sort the similarity scores (excluding the movie itself)
-        similar_games_idx = sorted(sim_scores, key=lambda x: x[1], reverse=True)[1:top_n+1]
-
-        # Prepare results
-        results = []
-        for i, _ in similar_games_idx:
-            game_data = games.loc[i]
-            # Safely split store names and domains into lists, or use empty lists
-            store_names = game_data['store_name'].split(', ')
-            store_domains = game_data['store_domain'].split(', ')
-
-            # Zip only if valid and lengths match
-            store_display = ', '.join([
-                    f"{name} : https://{domain}" for name, domain in zip(store_names, store_domains)
-                    ])
-                
-            # Check if all necessary fields exist
-            if any(field not in game_data for field in ['title', 'description_clean','genres', 'release_date', 'rating', 'tags', 'developers', 'publishers', 'esrb_rating', 'background_image_url','website']):
-                continue
-
-            results.append({
-                'Title': games.loc[i,'title'],
-                'Description': games.loc[i, 'description_clean'],
-                'Genre': games.loc[i, 'genres'],
-                'Release Date': games.loc[i,'release_date'],
-                'Rating': games.loc[i,'rating'],
-                'Platforms': games.loc[i, 'platforms'],
-                'Stores': store_display,
-                'Tags': games.loc[i,'tags'],
-                'Developer': games.loc[i, 'developers'],
-                'Publisher': games.loc[i,'publishers'],
-                'ESRB_Rating': games.loc[i,'esrb_rating'],
-                'Poster': games.loc[i, 'background_image_url'],
-                'Website': games.loc[i, 'website'],
-                'Screenshots': games.loc[i, 'screenshots']
-            })
-
-
-        return results
-    
-    except ValueError as ve:
-        return {'Error': str(ve)}
-    
-    except IndexError as ie:
-        return {'Error': f'Index error: {str(ie)}'}
-    
-    except Exception as e:
-        return {'Error': f'An unexpected error occurred: {str(e)}'}
+    return loaded(load_game_recommender(), "Loading the game catalogue...").recommend(user_input, top_n)
     
 # -------------------------------- Streamlit UI --------------------------------
 
@@ -908,8 +528,8 @@ elif selected == "Recommend Movies":
 
 
                     st.markdown("**Top Cast:**")
-                    cast_images = movie['Cast Picture'].split(',')
-                    cast_names = movie['Top Cast'].split(',')
+                    cast_images = movie['Cast Picture']
+                    cast_names = movie['Top Cast'] or ['not available']
                     cast_cols = st.columns(len(cast_names))
                     for k, col in enumerate(cast_cols):
                         with col:
@@ -1079,17 +699,8 @@ elif selected == "Recommend Games":
 
                     # --- Display top 3 store links as styled buttons ---
                     if game.get('Stores'):
-                        stores_raw = game['Stores']
-                        
-                        # Split and parse the stores
-                        store_links = []
-                        for entry in stores_raw.split(','):
-                            if ':' in entry:
-                                name, url = entry.split(':', 1)
-                                store_links.append((name.strip(), url.strip()))
-
-                        # Show only top 3 stores
-                        for name, url in store_links[:3]:
+                        # Stores come as (name, url) pairs, show only the top 3
+                        for name, url in game['Stores'][:3]:
                             st.markdown(f"""
                                 <a href="{url}" target="_blank" style="
                                     display: inline-block;
@@ -1131,7 +742,7 @@ elif selected == "Recommend Games":
                     if "screenshot_index" not in st.session_state:
                         st.session_state.screenshot_index = 0
 
-                    screenshots = game["Screenshots"].split(",")
+                    screenshots = game["Screenshots"]
                     total_screens = len(screenshots)
                     current_index = st.session_state.screenshot_index
 
@@ -1284,3 +895,25 @@ elif selected == "Contact Me":
                     st.exception(e)
             else:
                 st.warning("⚠ Please fill in all fields before submitting.")
+
+
+# ---------------------------- Background warm-up ----------------------------
+
+# Once the first page has been rendered, load both catalogues in a background thread (once per process), so the
+# first recommendation usually finds them loaded. RECOMMENDER_WARM_UP=0 turns it off, e.g. on small instances where
+# only the domains actually used should be loaded
+@st.cache_resource
+def start_warm_up():
+    # The recommenders are fetched here, in the script thread, where st.cache_resource has its context
+    recommenders = [load_movie_recommender(), load_game_recommender()]
+
+    def warm_up():
+        for recommender in recommenders:
+            recommender.load()
+
+    thread = threading.Thread(target=warm_up, name='recommender-warm-up', daemon=True)
+    thread.start()
+    return thread
+
+if os.environ.get('RECOMMENDER_WARM_UP', '1') != '0':
+    start_warm_up()
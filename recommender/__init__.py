@@ -0,0 +1,25 @@
+# Headless movie / game recommendation engine, usable without Streamlit:
+#
+#   from recommender import MovieRecommender
+#   movies = MovieRecommender().load()
+#   movies.recommend("znmd", top_n=10)
+
+from .aliases import alias_dict, movie_aliases
+from .cache import LRUCache
+from .engine import BatchResult, GameRecommender, MovieRecommender, Recommender
+from .ranking import similarity_row, top_n_indices, top_n_rows
+from .titles import clean_title
+
+__all__ = [
+    'Recommender',
+    'MovieRecommender',
+    'GameRecommender',
+    'BatchResult',
+    'LRUCache',
+    'clean_title',
+    'similarity_row',
+    'top_n_indices',
+    'top_n_rows',
+    'movie_aliases',
+    'alias_dict',
+]
@@ -0,0 +1,134 @@
+# Approximate nearest-neighbour index for large catalogues (optional, see README).
+#
+# The TF-IDF matrix is reduced to dense, L2-normalised embeddings with TruncatedSVD, and the embeddings
+# are grouped into inverted lists around spherical k-means centroids (IVF). A query only scores the
+# items of the nprobe lists closest to it, then re-ranks the best candidates with the exact sparse
+# cosine similarity, so build time and storage grow linearly with the catalogue instead of N x N.
+# The index is built with python -m recommender.build_ann (see build_ann.py).
+
+import os
+
+import numpy as np
+
+from .ranking import similarity_row, top_n_indices
+
+N_COMPONENTS = 128          # Embedding dimensions
+N_PROBE = 8                 # Inverted lists scanned per query
+RERANK_FACTOR = 30          # Candidates re-ranked exactly per requested result
+KMEANS_ITERATIONS = 10
+KMEANS_SAMPLE_SIZE = 100000 # Rows used to train the centroids
+BLOCK_SIZE = 4096           # Rows assigned to centroids per matrix product
+
+ANN_PARTS = ['embeddings', 'centroids', 'list_rows', 'list_offsets']
+
+
+# L2-normalised dense embeddings (float32) of the TF-IDF rows:
+def build_embeddings(matrix, n_components=N_COMPONENTS, random_state=42):
+    # scikit-learn is only needed to build an index, not to serve one
+    from sklearn.decomposition import TruncatedSVD
+
+    n_components = min(n_components, matrix.shape[1] - 1)
+    embeddings = TruncatedSVD(n_components=n_components, random_state=random_state).fit_transform(matrix)
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return (embeddings / norms).astype(np.float32)
+
+
+# Index of the closest centroid (highest dot product) for every row:
+def assign_lists(embeddings, centroids):
+    assignment = np.empty(len(embeddings), dtype=np.int32)
+    for start in range(0, len(embeddings), BLOCK_SIZE):
+        block = embeddings[start:start + BLOCK_SIZE]
+        assignment[start:start + BLOCK_SIZE] = np.argmax(block @ centroids.T, axis=1)
+    return assignment
+
+
+# Spherical k-means over the embeddings, trained on a sample for large catalogues:
+def train_centroids(embeddings, n_lists, n_iter=KMEANS_ITERATIONS, random_state=42):
+    rng = np.random.default_rng(random_state)
+    sample = embeddings
+    if len(embeddings) > KMEANS_SAMPLE_SIZE:
+        sample = embeddings[np.sort(rng.choice(len(embeddings), KMEANS_SAMPLE_SIZE, replace=False))]
+
+    centroids = sample[rng.choice(len(sample), n_lists, replace=False)].copy()
+    for _ in range(n_iter):
+        assignment = assign_lists(sample, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, sample)
+        counts = np.bincount(assignment, minlength=n_lists)
+
+        # Empty lists are restarted from random rows
+        empty = counts == 0
+        sums[empty] = sample[rng.choice(len(sample), int(empty.sum()), replace=False)]
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        norms[norms == 0] = 1
+        centroids = (sums / norms).astype(np.float32)
+    return centroids
+
+
+# IVF index over the embeddings: centroids plus the row ids of every list (list_rows[offsets[l]:offsets[l + 1]]):
+def build_ann_index(matrix, n_components=N_COMPONENTS, n_lists=None, random_state=42):
+    embeddings = build_embeddings(matrix, n_components, random_state)
+    if n_lists is None:
+        n_lists = max(1, int(np.sqrt(len(embeddings))))
+    n_lists = min(n_lists, len(embeddings))
+
+    centroids = train_centroids(embeddings, n_lists, random_state=random_state)
+    assignment = assign_lists(embeddings, centroids)
+    list_rows = np.argsort(assignment, kind='stable').astype(np.int32)
+    list_offsets = np.concatenate([[0], np.cumsum(np.bincount(assignment, minlength=n_lists))]).astype(np.int64)
+    return {'embeddings': embeddings, 'centroids': centroids, 'list_rows': list_rows, 'list_offsets': list_offsets}
+
+
+def save_ann_index(dir_path, index):
+    os.makedirs(dir_path, exist_ok=True)
+    for part in ANN_PARTS:
+        np.save(os.path.join(dir_path, f"{part}.npy"), index[part])
+
+
+# The index arrays are memory-mapped read-only, like the TF-IDF artifacts:
+def load_ann_index(dir_path):
+    return {part: np.load(os.path.join(dir_path, f"{part}.npy"), mmap_mode='r') for part in ANN_PARTS}
+
+
+# Best top_n (index, score) pairs for an item from the ANN index, excluding the item itself
+# (and every item outside the boolean mask, when one is given). Scores are exact cosine similarities.
+# When fewer than top_n members of the nprobe closest lists pass the mask, further lists are probed (twice as many
+# each round, up to all of them), so a filtered request returns a full page whenever enough of the catalogue matches
+def ann_neighbours(index, matrix, idx, top_n, mask=None, nprobe=N_PROBE):
+    if top_n < 1:
+        raise ValueError(f"top_n must be at least 1, got {top_n}.")
+    query = np.asarray(index['embeddings'][idx])
+    offsets = index['list_offsets']
+
+    # Candidates: the members of the lists closest to the query
+    lists = top_n_indices(index['centroids'] @ query, len(index['centroids']))
+    probed, n_probe, found = 0, min(nprobe, len(lists)), []
+    while True:
+        for l in lists[probed:n_probe]:
+            members = index['list_rows'][offsets[l]:offsets[l + 1]]
+            members = members[members != idx]
+            found.append(members[mask[members]] if mask is not None else members)
+        probed = n_probe
+        if sum(len(members) for members in found) >= top_n or probed == len(lists):
+            break
+        n_probe = min(2 * n_probe, len(lists))
+    candidates = np.concatenate(found)
+
+    # Keep the best candidates by embedding score, then re-rank them with the exact sparse cosine similarity
+    shortlist = candidates[top_n_indices(index['embeddings'][candidates] @ query, top_n * RERANK_FACTOR)]
+    exact_scores = (matrix[shortlist] @ matrix[idx].T).toarray().ravel()
+    return [(int(shortlist[i]), float(exact_scores[i])) for i in top_n_indices(exact_scores, top_n)]
+
+
+# Mean recall@k of the ANN index against the exact cosine top-k over a sample of items:
+def recall_at_k(index, matrix, k=10, sample_size=1000, nprobe=N_PROBE, random_state=42):
+    rng = np.random.default_rng(random_state)
+    sample = rng.choice(matrix.shape[0], min(sample_size, matrix.shape[0]), replace=False)
+    hits = 0
+    for idx in sample:
+        exact = top_n_indices(similarity_row(matrix, idx), k, exclude=[idx])
+        approximate = [i for i, _ in ann_neighbours(index, matrix, idx, k, nprobe=nprobe)]
+        hits += len(np.intersect1d(exact, approximate))
+    return hits / (len(sample) * k)
+
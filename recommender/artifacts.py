@@ -0,0 +1,90 @@
+import json
+import os
+import pickle
+import shutil
+
+import numpy as np
+from scipy import sparse
+
+from .quantise import dequantise_matrix_data, quantise_matrix_data
+
+# Artifacts live in the repository root by default (next to this package)
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+
+# Pickled pandas DataFrame with the item metadata:
+def load_pickle(file_path):
+    with open(file_path, 'rb') as f:
+        return pickle.load(f)
+
+
+# The similarity matrices are kept as L2-normalised sparse TF-IDF matrices,
+# a similarity row is computed on demand instead of loading the dense N x N cosine matrix.
+# The CSR arrays are memory-mapped read-only, so processes on the same host share one page-cache copy.
+# Values stored as float16 or uint8 (see quantise.py) are dequantised to float32 in memory instead
+def load_sparse_matrix(dir_path):
+    data, indices, indptr = (np.load(os.path.join(dir_path, f"{part}.npy"), mmap_mode='r')
+                             for part in ['data', 'indices', 'indptr'])
+    shape = tuple(int(n) for n in np.load(os.path.join(dir_path, "shape.npy")))
+    if data.dtype not in (np.float32, np.float64):
+        row_scale_file = os.path.join(dir_path, "row_scale.npy")
+        row_scale = np.load(row_scale_file) if data.dtype == np.uint8 else None
+        data = dequantise_matrix_data(data, indptr, row_scale)
+    return sparse.csr_matrix((data, indices, indptr), shape=shape, copy=False)
+
+
+# Precomputed top-K neighbour table (N x K records of int32 index + score, float16 unless built with another
+# score dtype, see quantise.py), memory-mapped read-only:
+def load_neighbours(file_path):
+    return np.load(file_path, mmap_mode='r')
+
+
+# Artifacts are written to a temporary file and moved into place, so a running app that has the
+# previous version memory-mapped keeps reading consistent data until it reloads:
+def _replace_atomically(file_path, write):
+    tmp_path = f"{file_path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        write(f)
+    os.replace(tmp_path, file_path)
+
+
+def copy_file(source_path, file_path):
+    def write(f):
+        with open(source_path, 'rb') as source:
+            shutil.copyfileobj(source, f)
+    _replace_atomically(file_path, write)
+
+
+def save_pickle(file_path, obj):
+    _replace_atomically(file_path, lambda f: pickle.dump(obj, f))
+
+
+def save_array(file_path, array):
+    _replace_atomically(file_path, lambda f: np.save(f, array))
+
+
+def save_json(file_path, obj):
+    _replace_atomically(file_path, lambda f: f.write(json.dumps(obj, indent=2).encode('utf-8')))
+
+
+# Data type of the stored TF-IDF values:
+def stored_matrix_dtype(dir_path):
+    return np.load(os.path.join(dir_path, "data.npy"), mmap_mode='r').dtype.name
+
+
+# Same layout as load_sparse_matrix reads (data / indices / indptr / shape .npy files, plus row_scale.npy for uint8),
+# with the values stored as dtype:
+def save_sparse_matrix(dir_path, matrix, dtype='float64'):
+    os.makedirs(dir_path, exist_ok=True)
+    matrix = matrix.tocsr()
+    data, row_scale = quantise_matrix_data(matrix, dtype)
+    save_array(os.path.join(dir_path, "data.npy"), data)
+    for part in ['indices', 'indptr']:
+        save_array(os.path.join(dir_path, f"{part}.npy"), getattr(matrix, part))
+    save_array(os.path.join(dir_path, "shape.npy"), np.array(matrix.shape))
+
+    row_scale_file = os.path.join(dir_path, "row_scale.npy")
+    if row_scale is not None:
+        save_array(row_scale_file, row_scale)
+    elif os.path.exists(row_scale_file):
+        os.remove(row_scale_file)
@@ -0,0 +1,212 @@
+# Benchmark of the recommendation path on the real artifacts, replaying a realistic query mix:
+# exact titles, alias shortcuts, misspelled titles and empty / garbage input.
+#
+#   python -m recommender.bench movies --queries 2000 --output bench_movies.json
+#   python -m recommender.bench movies --baseline bench_movies.json     # Exit code 1 on a regression
+#
+# Reports the cold-start time, p50 / p95 / p99 latency per stage (the metrics spans of recommend(): normalise, alias,
+# match, neighbours, materialise) and end to end per query kind, the throughput and the peak RSS, and writes them
+# as JSON.
+
+import argparse
+import json
+import os
+import platform
+import resource
+import string
+import sys
+import time
+
+import numpy as np
+
+from .artifacts import BASE_DIR
+from .engine import GameRecommender, MovieRecommender
+from .metrics import Metrics
+
+RECOMMENDERS = {'movies': MovieRecommender, 'games': GameRecommender}
+QUERY_MIX = {'exact': 0.4, 'alias': 0.2, 'misspelled': 0.3, 'garbage': 0.1}
+PERCENTILES = [50, 95, 99]
+STAGES = ['normalise', 'alias', 'match', 'neighbours', 'materialise']
+GARBAGE = ['', '   ', '!!!', '???', '12345', '\t\n']
+
+
+# Peak resident set size of the process in MB (ru_maxrss is in KB on Linux and in bytes on macOS):
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (2**20 if sys.platform == 'darwin' else 2**10), 1)
+
+
+# One or two random edits (delete, swap, replace or insert a letter) of a title:
+def misspell(title, rng):
+    letters = list(title)
+    for _ in range(rng.integers(1, 3)):
+        if len(letters) < 2:
+            break
+        position = int(rng.integers(0, len(letters) - 1))
+        edit = rng.integers(0, 4)
+        if edit == 0:
+            del letters[position]
+        elif edit == 1:
+            letters[position], letters[position + 1] = letters[position + 1], letters[position]
+        elif edit == 2:
+            letters[position] = rng.choice(list(string.ascii_lowercase))
+        else:
+            letters.insert(position, rng.choice(list(string.ascii_lowercase)))
+    return ''.join(letters)
+
+
+def garbage(rng):
+    if rng.random() < 0.5:
+        return GARBAGE[int(rng.integers(0, len(GARBAGE)))]
+    return ''.join(rng.choice(list(string.ascii_lowercase + string.punctuation + ' '), int(rng.integers(3, 16))))
+
+
+# List of (kind, query) drawn from the catalogue titles and aliases with the QUERY_MIX shares:
+def query_mix(recommender, n_queries, seed=42):
+    rng = np.random.default_rng(seed)
+    titles = [title for title in recommender.items['title'] if isinstance(title, str) and title.strip()]
+    aliases = list(recommender.aliases)
+    kinds = [kind for kind in QUERY_MIX if kind != 'alias' or aliases]
+    shares = np.array([QUERY_MIX[kind] for kind in kinds])
+
+    queries = []
+    for kind in rng.choice(kinds, n_queries, p=shares / shares.sum()):
+        if kind == 'exact':
+            query = titles[int(rng.integers(0, len(titles)))]
+        elif kind == 'alias':
+            query = aliases[int(rng.integers(0, len(aliases)))]
+        elif kind == 'misspelled':
+            query = misspell(titles[int(rng.integers(0, len(titles)))], rng)
+        else:
+            query = garbage(rng)
+        queries.append((str(kind), query))
+    return queries
+
+
+# Metrics that keep the stage timings of every recorded request, for the per-stage latencies of the benchmark:
+class StageTimings(Metrics):
+    def __init__(self):
+        super().__init__()
+        self.timings = {stage: [] for stage in STAGES}
+        self.recording = False
+
+    def record(self, request, seconds):
+        super().record(request, seconds)
+        if self.recording:
+            for stage, stage_seconds in request.stages.items():
+                self.timings.setdefault(stage, []).append(stage_seconds)
+
+
+# {count, p50, p95, p99, mean} of a list of durations in milliseconds:
+def summarise(seconds):
+    if not seconds:
+        return {'count': 0}
+    milliseconds = np.asarray(seconds) * 1000
+    summary = {'count': len(milliseconds)}
+    for percentile, value in zip(PERCENTILES, np.percentile(milliseconds, PERCENTILES)):
+        summary[f"p{percentile}"] = round(float(value), 4)
+    summary['mean'] = round(float(milliseconds.mean()), 4)
+    return summary
+
+
+def run_benchmark(domain, base_dir=BASE_DIR, n_queries=2000, top_n=10, seed=42, use_ann=False):
+    # Cold start: artifact loading plus the first query
+    started = time.perf_counter()
+    metrics = StageTimings()
+    recommender = RECOMMENDERS[domain](base_dir, use_ann=use_ann, metrics=metrics).load()
+    load_seconds = time.perf_counter() - started
+    queries = query_mix(recommender, n_queries, seed)
+    started = time.perf_counter()
+    recommender.recommend(queries[0][1], top_n)
+    first_query_seconds = time.perf_counter() - started
+    rss_after_load = peak_rss_mb()
+
+    # End to end through recommend(), with the result cache cleared so every query does the full work, and per stage
+    # from the spans of the same requests
+    metrics.recording = True
+    latencies = {kind: [] for kind in QUERY_MIX}
+    failures = 0
+    started = time.perf_counter()
+    for kind, query in queries:
+        recommender.cache.clear()
+        query_started = time.perf_counter()
+        results = recommender.recommend(query, top_n)
+        latencies[kind].append(time.perf_counter() - query_started)
+        failures += isinstance(results, dict)
+    total_seconds = time.perf_counter() - started
+    metrics.recording = False
+
+    all_latencies = [latency for kind_latencies in latencies.values() for latency in kind_latencies]
+    return {
+        'domain': domain,
+        'items': len(recommender.items),
+        'queries': n_queries,
+        'top_n': top_n,
+        'seed': seed,
+        'use_ann': use_ann,
+        'run_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'environment': {'python': platform.python_version(), 'numpy': np.__version__, 'machine': platform.machine(),
+                        'cpus': os.cpu_count()},
+        'cold_start': {'load_ms': round(load_seconds * 1000, 2), 'first_query_ms': round(first_query_seconds * 1000, 2)},
+        'latency': dict({'all': summarise(all_latencies)},
+                        **{kind: summarise(kind_latencies) for kind, kind_latencies in latencies.items() if kind_latencies}),
+        'stages': {stage: summarise(stage_timings) for stage, stage_timings in metrics.timings.items()},
+        'throughput_qps': round(n_queries / total_seconds, 1),
+        'failed_queries': failures,
+        'peak_rss_mb': {'after_load': rss_after_load, 'end': peak_rss_mb()}
+    }
+
+
+# Metrics more than tolerance (relative) slower than in the baseline, as (name, baseline, current):
+def regressions(report, baseline, tolerance):
+    pairs = [('cold_start.load_ms', baseline['cold_start']['load_ms'], report['cold_start']['load_ms'])]
+    for section in ['latency', 'stages']:
+        for name, summary in report[section].items():
+            previous = baseline.get(section, {}).get(name, {})
+            if 'p95' in summary and 'p95' in previous:
+                pairs.append((f"{section}.{name}.p95", previous['p95'], summary['p95']))
+    return [(name, before, after) for name, before, after in pairs if after > before * (1 + tolerance)]
+
+
+def print_report(report):
+    print(f"{report['domain']}: {report['items']} items, {report['queries']} queries, top_n={report['top_n']}")
+    print(f"  cold start: load {report['cold_start']['load_ms']:.1f} ms, first query {report['cold_start']['first_query_ms']:.1f} ms")
+    print(f"  throughput: {report['throughput_qps']:.1f} queries/s ({report['failed_queries']} returned an error)")
+    print(f"  peak RSS:   {report['peak_rss_mb']['after_load']:.1f} MB after load, {report['peak_rss_mb']['end']:.1f} MB at the end")
+    for section in ['latency', 'stages']:
+        print(f"  {section + ' (ms)':<16}{'count':>7}" + ''.join(f"{f'p{p}':>10}" for p in PERCENTILES))
+        for name, summary in report[section].items():
+            if summary['count']:
+                print(f"    {name:<14}{summary['count']:>7}" + ''.join(f"{summary[f'p{p}']:>10.3f}" for p in PERCENTILES))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the recommendation path with a realistic query mix.")
+    parser.add_argument('domain', choices=list(RECOMMENDERS))
+    parser.add_argument('--base-dir', default=BASE_DIR)
+    parser.add_argument('--queries', type=int, default=2000)
+    parser.add_argument('--top-n', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--use-ann', action='store_true', help="Serve from the approximate <domain>_ann index")
+    parser.add_argument('--output', help="Write the results as JSON")
+    parser.add_argument('--baseline', help="JSON results of an earlier run to check for regressions")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="Allowed relative slowdown against the baseline")
+    args = parser.parse_args(argv)
+
+    report = run_benchmark(args.domain, args.base_dir, args.queries, args.top_n, args.seed, args.use_ann)
+    print_report(report)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            slower = regressions(report, json.load(f), args.tolerance)
+        for name, before, after in slower:
+            print(f"  regression: {name} {before:.3f} -> {after:.3f}")
+        if slower:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
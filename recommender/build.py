@@ -0,0 +1,250 @@
+# Offline build pipeline, replaces hand-running the recommendation notebooks:
+#
+#   python -m recommender.build movies --raw tmdb_movies.csv --trailers Movie_data/movie_trailers.csv
+#   python -m recommender.build games --raw Games.csv --screenshots Game_data/game_screenshots.csv \
+#                                     --platforms Game_data/game_platforms_async.csv
+#
+# Stages: load raw CSV -> clean titles -> build soup -> vectorise -> index -> write artifacts.
+# Every stage output is cached under <base-dir>/.build_cache/<domain>/, keyed on a content hash of its input,
+# its parameters and the code of the package modules it depends on, so a rebuild only runs the stages downstream of
+# what actually changed.
+# The pipeline reports the time of every stage, the peak memory traced in the build process (tracemalloc, which
+# does not see worker processes) and the peak RSS of the preprocessing workers, and writes <domain>_manifest.json.
+# --score-dtype / --tfidf-dtype choose the storage dtypes of the artifacts (see quantise.py), and
+# --quantisation-report measures the served score error of each score dtype and how many top-10 lists each TF-IDF
+# dtype changes.
+
+import argparse
+import glob
+import hashlib
+import inspect
+import json
+import os
+import pickle
+import resource
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from .artifacts import BASE_DIR, copy_file, save_array, save_pickle, save_sparse_matrix
+from .columns import save_columns
+from .preprocess import add_clean_titles, build_game_soup, build_movie_soup, load_games, load_movies, vectorise
+from .quantise import SCORE_DTYPES, TFIDF_DTYPES, quantisation_report, quantise_neighbours
+from .ranking import NEIGHBOURS_K, build_neighbour_file
+
+# Per domain: soup column, raw loader, soup builder and whether rows with empty titles are dropped
+DOMAINS = {
+    'movies': {'soup_column': 'final_soup',
+               'load': load_movies, 'soup': build_movie_soup, 'drop_empty_titles': False},
+    'games': {'soup_column': 'cleaned_soup',
+              'load': load_games, 'soup': build_game_soup, 'drop_empty_titles': True}
+}
+
+
+def file_digest(file_path):
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+# Peak RSS in MB of the largest child process waited for so far, e.g. the text preprocessing workers
+# (ru_maxrss is in KB on Linux and in bytes on macOS):
+def children_peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return round(peak / (2**20 if sys.platform == 'darwin' else 2**10), 1)
+
+
+# Names of the package modules a stage depends on: the module defining fn and, recursively, every package module
+# it uses something from (e.g. preprocess uses titles.clean_title and columns.parse_list):
+def stage_modules(fn):
+    package = __name__.rpartition('.')[0]
+    pending, modules = [inspect.getmodule(fn)], {}
+    while pending:
+        module = pending.pop()
+        if module.__name__ in modules:
+            continue
+        modules[module.__name__] = module
+        for value in vars(module).values():
+            dependency = value if inspect.ismodule(value) else inspect.getmodule(value)
+            if dependency is not None and dependency.__name__.startswith(f"{package}."):
+                pending.append(dependency)
+    return modules
+
+
+# Cache key of a stage: its name, the code of the package modules it depends on, its parameters and the digest
+# of its input:
+def stage_key(name, fn, params, input_digest):
+    modules = stage_modules(fn)
+    digest = hashlib.sha256()
+    for part in [name, *(inspect.getsource(modules[module]) for module in sorted(modules)),
+                 json.dumps(params, sort_keys=True, default=str), input_digest]:
+        digest.update(part.encode('utf-8'))
+    return digest.hexdigest()
+
+
+# Run one stage, or load its output from the cache when the key is unchanged.
+# Options only change how a stage runs, not its output (e.g. the number of workers), so they are not part of the key.
+# Stages producing large arrays write their cache file themselves (writes_file: fn gets file_path and
+# writes a .npy there), and their output is memory-mapped back instead of being pickled.
+# Returns (output, digest of the output) and appends the stage timing to report
+def run_stage(cache_dir, name, fn, args, params, input_digest, report, force=False, options=None, writes_file=False):
+    key = stage_key(name, fn, params, input_digest)
+    extension = 'npy' if writes_file else 'pkl'
+    cache_file = os.path.join(cache_dir, f"{name}-{key[:16]}.{extension}")
+    started = time.perf_counter()
+    tracemalloc.reset_peak()
+    children_peak = children_peak_rss_mb()
+
+    cached = os.path.exists(cache_file) and not force
+    if cached and writes_file:
+        output = np.load(cache_file, mmap_mode='r')
+    elif cached:
+        with open(cache_file, 'rb') as f:
+            output = pickle.load(f)
+    else:
+        # Only the latest output of every stage is kept
+        for stale_file in glob.glob(os.path.join(cache_dir, f"{name}-*.{extension}")):
+            os.remove(stale_file)
+        if writes_file:
+            output = fn(*args, file_path=cache_file, **params, **(options or {}))
+        else:
+            output = fn(*args, **params, **(options or {}))
+            save_pickle(cache_file, output)
+
+    workers_peak = children_peak_rss_mb()
+    report.append({
+        'stage': name,
+        'cached': cached,
+        'seconds': round(time.perf_counter() - started, 3),
+        'parent_peak_mb': round(tracemalloc.get_traced_memory()[1] / 2**20, 1),
+        # Only known when a worker of this stage set a new high-water mark
+        'workers_peak_rss_mb': workers_peak if workers_peak > children_peak else None
+    })
+    return output, file_digest(cache_file)
+
+
+# Write the full-precision neighbour table of the index stage with its scores stored as score_dtype:
+def save_neighbours(file_path, neighbours, score_dtype):
+    if neighbours['score'].dtype == np.dtype(score_dtype):
+        copy_file(neighbours.filename, file_path)
+    else:
+        save_array(file_path, quantise_neighbours(neighbours, score_dtype))
+
+
+def build(domain, raw_paths, base_dir=BASE_DIR, k=NEIGHBOURS_K, force=False, workers=None,
+          score_dtype='float16', tfidf_dtype='float64', measure_quantisation=False):
+    config = DOMAINS[domain]
+    cache_dir = os.path.join(base_dir, '.build_cache', domain)
+    os.makedirs(cache_dir, exist_ok=True)
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+    report = []
+    raw_digest = hashlib.sha256(''.join(file_digest(path) for path in raw_paths.values() if path).encode()).hexdigest()
+    items, digest = run_stage(cache_dir, 'load', config['load'], [], raw_paths, raw_digest, report, force)
+    items, digest = run_stage(cache_dir, 'clean_titles', add_clean_titles, [items],
+                              {'drop_empty': config['drop_empty_titles']}, digest, report, force)
+    items, digest = run_stage(cache_dir, 'soup', config['soup'], [items], {}, digest, report, force,
+                              options={'workers': workers})
+    items_digest = digest
+    (vectorizer, matrix), digest = run_stage(cache_dir, 'vectorise', vectorise, [items],
+                                             {'soup_column': config['soup_column']}, digest, report, force)
+    # The table is built at full precision (float32 scores) and quantised once to score_dtype when it is written
+    neighbours, digest = run_stage(cache_dir, 'index', build_neighbour_file, [matrix], {'k': k, 'score_dtype': 'float32'},
+                                   digest, report, force, options={'workers': workers}, writes_file=True)
+
+    # Write the artifacts unless the manifest shows they were written from the same stage outputs
+    manifest_file = os.path.join(base_dir, f"{domain}_manifest.json")
+    outputs = {'items': items_digest, 'index': digest, 'score_dtype': score_dtype, 'tfidf_dtype': tfidf_dtype}
+    started = time.perf_counter()
+    tracemalloc.reset_peak()
+    previous = {}
+    if os.path.exists(manifest_file):
+        with open(manifest_file) as f:
+            previous = json.load(f)
+
+    written = previous.get('outputs') != outputs or force
+    if written:
+        save_columns(os.path.join(base_dir, f"{domain}_columns"), items)
+        save_sparse_matrix(os.path.join(base_dir, f"{domain}_tfidf"), matrix, tfidf_dtype)
+        save_neighbours(os.path.join(base_dir, f"{domain}_neighbours.npy"), neighbours, score_dtype)
+        save_pickle(os.path.join(base_dir, f"{domain}_vectorizer.pkl"), vectorizer)
+
+        # A full build refits the vocabulary, so the incremental ingest bookkeeping starts over
+        ingest_state = os.path.join(base_dir, f"{domain}_ingest.json")
+        if os.path.exists(ingest_state):
+            os.remove(ingest_state)
+    report.append({'stage': 'write', 'cached': not written, 'seconds': round(time.perf_counter() - started, 3),
+                   'parent_peak_mb': round(tracemalloc.get_traced_memory()[1] / 2**20, 1), 'workers_peak_rss_mb': None})
+
+    manifest = {
+        'domain': domain,
+        'built_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'inputs': {name: path for name, path in raw_paths.items() if path},
+        'items': matrix.shape[0],
+        'vocabulary': matrix.shape[1],
+        'neighbours': k,
+        'outputs': outputs,
+        'stages': report
+    }
+    if measure_quantisation:
+        manifest['quantisation'] = quantisation_report(matrix)
+    with open(manifest_file, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def print_report(manifest):
+    print(f"{manifest['domain']}: {manifest['items']} items, {manifest['vocabulary']} terms")
+    print(f"  {'stage':<14}{'status':<9}{'seconds':>9}{'parent peak MB':>16}{'worker RSS MB':>15}")
+    for stage in manifest['stages']:
+        status = 'cached' if stage['cached'] else 'ran'
+        workers_rss = stage['workers_peak_rss_mb']
+        print(f"  {stage['stage']:<14}{status:<9}{stage['seconds']:>9.3f}{stage['parent_peak_mb']:>16.1f}"
+              f"{workers_rss if workers_rss is not None else '-':>15}")
+
+    if 'quantisation' in manifest:
+        quantisation = manifest['quantisation']
+        print(f"  served top-{quantisation['k']} scores over {quantisation['items']} sampled items:")
+        print(f"    {'dtype':<9}{'max error':>11}{'mean error':>12}")
+        for dtype, scores in quantisation['scores'].items():
+            print(f"    {dtype:<9}{scores['max_error']:>11.2e}{scores['mean_error']:>12.2e}")
+        print(f"  top-{quantisation['k']} lists changed by the TF-IDF dtype:")
+        for dtype, share in quantisation['tfidf'].items():
+            print(f"    {dtype:<9}{share:>8.2%}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the recommendation artifacts of a catalogue from the raw CSVs.")
+    parser.add_argument('domain', choices=list(DOMAINS))
+    parser.add_argument('--raw', required=True, help="tmdb_movies.csv or Games.csv from the data collection notebooks")
+    parser.add_argument('--trailers', help="movie_trailers.csv (movies)")
+    parser.add_argument('--screenshots', help="game_screenshots.csv (games)")
+    parser.add_argument('--platforms', help="game_platforms_async.csv (games)")
+    parser.add_argument('--base-dir', default=BASE_DIR, help="Where the artifacts are written")
+    parser.add_argument('--neighbours', type=int, default=NEIGHBOURS_K, help="Entries per row in the neighbour table")
+    parser.add_argument('--force', action='store_true', help="Ignore the stage cache")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="Processes for the text preprocessing and threads for the index (default: all cores)")
+    parser.add_argument('--score-dtype', choices=SCORE_DTYPES, default='float16',
+                        help="Storage dtype of the neighbour table scores")
+    parser.add_argument('--tfidf-dtype', choices=TFIDF_DTYPES, default='float64',
+                        help="Storage dtype of the TF-IDF values")
+    parser.add_argument('--quantisation-report', action='store_true',
+                        help="Measure the served score error and the top-10 list changes of every storage dtype")
+    args = parser.parse_args(argv)
+
+    if args.domain == 'movies':
+        raw_paths = {'raw_path': args.raw, 'trailers_path': args.trailers}
+    else:
+        raw_paths = {'raw_path': args.raw, 'screenshots_path': args.screenshots, 'platforms_path': args.platforms}
+    print_report(build(args.domain, raw_paths, args.base_dir, args.neighbours, args.force, args.workers,
+                       args.score_dtype, args.tfidf_dtype, args.quantisation_report))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,173 @@
+# Columnar item metadata (<domain>_columns/), used instead of the pickled DataFrames.
+#
+# Every column is stored in plain .npy files (no pickle, so the artifacts do not depend on the pandas version):
+#   numbers - <column>.npy, int64 for integer columns, otherwise float64 with NaN for missing values
+#   strings - <column>.values.npy (UTF-8 bytes of all rows, uint8) and <column>.offsets.npy (int64, rows + 1),
+#             plus <column>.missing.npy (bool) when some rows have no value
+#   lists   - the strings of every row's list flattened as above, plus <column>.lists.npy (int64, rows + 1) with the
+#             range of every row in the flat strings, so a row's list is sliced without parsing anything
+# columns.json lists the columns, their kind and the number of rows, and is written last.
+# The files are memory-mapped read-only, and strings are only decoded for the rows that are read.
+
+import ast
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from .artifacts import save_array, save_json
+
+SCHEMA_FILE = 'columns.json'
+
+
+# List of strings from a list, a stringified Python list ("['a', 'b']") or a separator-joined string, whose items
+# are stripped (None / NaN give an empty list):
+def parse_list(value, separator=', '):
+    if isinstance(value, (list, tuple, np.ndarray)):
+        return [str(item) for item in value]
+    if not isinstance(value, str):
+        return []
+    if value.startswith('['):
+        return [str(item) for item in ast.literal_eval(value)]
+    return [item.strip() for item in value.split(separator) if item.strip()]
+
+
+def is_list_column(column):
+    return column.dtype == object and column.map(lambda value: isinstance(value, (list, tuple))).any()
+
+
+# Flat UTF-8 bytes and offsets of a sequence of strings:
+def encode_strings(strings):
+    encoded = [value.encode('utf-8') for value in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(value) for value in encoded], out=offsets[1:])
+    return np.frombuffer(b''.join(encoded), dtype=np.uint8), offsets
+
+
+def decode_strings(values, offsets):
+    buffer = bytes(values)
+    return [buffer[start:end].decode('utf-8') for start, end in zip(offsets[:-1].tolist(), offsets[1:].tolist())]
+
+
+def string_values(column):
+    if pd.api.types.is_datetime64_any_dtype(column):
+        return column.dt.strftime('%Y-%m-%d')
+    return column
+
+
+# Write a DataFrame as a column directory:
+def save_columns(dir_path, items):
+    os.makedirs(dir_path, exist_ok=True)
+    schema = {'rows': len(items), 'columns': {}}
+    for name in items.columns:
+        column = items[name]
+        if pd.api.types.is_integer_dtype(column):
+            save_array(os.path.join(dir_path, f"{name}.npy"), column.to_numpy(dtype=np.int64))
+            schema['columns'][name] = 'number'
+            continue
+        if pd.api.types.is_numeric_dtype(column) and not pd.api.types.is_bool_dtype(column):
+            save_array(os.path.join(dir_path, f"{name}.npy"), column.to_numpy(dtype=np.float64, na_value=np.nan))
+            schema['columns'][name] = 'number'
+            continue
+
+        if is_list_column(column):
+            lists = [parse_list(value) for value in column]
+            values, offsets = encode_strings([item for row in lists for item in row])
+            list_offsets = np.zeros(len(lists) + 1, dtype=np.int64)
+            np.cumsum([len(row) for row in lists], out=list_offsets[1:])
+            save_array(os.path.join(dir_path, f"{name}.values.npy"), values)
+            save_array(os.path.join(dir_path, f"{name}.offsets.npy"), offsets)
+            save_array(os.path.join(dir_path, f"{name}.lists.npy"), list_offsets)
+            schema['columns'][name] = 'list'
+            continue
+
+        column = string_values(column)
+        missing = column.isna().to_numpy()
+        values, offsets = encode_strings(['' if is_missing else str(value) for value, is_missing in zip(column, missing)])
+        save_array(os.path.join(dir_path, f"{name}.values.npy"), values)
+        save_array(os.path.join(dir_path, f"{name}.offsets.npy"), offsets)
+
+        missing_file = os.path.join(dir_path, f"{name}.missing.npy")
+        if missing.any():
+            save_array(missing_file, missing)
+        elif os.path.exists(missing_file):
+            os.remove(missing_file)
+        schema['columns'][name] = 'string'
+
+    # The schema goes last, so a reader never sees columns that are not written yet
+    save_json(os.path.join(dir_path, SCHEMA_FILE), schema)
+
+
+# Read-only view of a column directory. All column files are memory-mapped when it is opened (nothing is decoded),
+# take() decodes the given rows of one column and store[name] decodes a whole column as a pandas Series
+class ColumnStore:
+    def __init__(self, dir_path):
+        self.dir_path = dir_path
+        with open(os.path.join(dir_path, SCHEMA_FILE)) as f:
+            schema = json.load(f)
+        self.rows = schema['rows']
+        self.kinds = schema['columns']
+        self.arrays = {name: self.open_column(name, kind) for name, kind in self.kinds.items()}
+
+    def open_column(self, name, kind):
+        if kind == 'number':
+            return np.load(os.path.join(self.dir_path, f"{name}.npy"), mmap_mode='r')
+
+        # (values, offsets, missing mask for strings / row ranges for lists)
+        extra_file = os.path.join(self.dir_path, f"{name}.lists.npy" if kind == 'list' else f"{name}.missing.npy")
+        return (np.load(os.path.join(self.dir_path, f"{name}.values.npy"), mmap_mode='r'),
+                np.load(os.path.join(self.dir_path, f"{name}.offsets.npy"), mmap_mode='r'),
+                np.load(extra_file, mmap_mode='r') if os.path.exists(extra_file) else None)
+
+    def __len__(self):
+        return self.rows
+
+    def __contains__(self, name):
+        return name in self.kinds
+
+    @property
+    def columns(self):
+        return list(self.kinds)
+
+    # Values of one column for the given row positions (numeric array for numbers, otherwise object array of
+    # str / None for strings and of lists of str for lists):
+    def take(self, name, positions):
+        positions = np.asarray(positions, dtype=np.intp)
+        if self.kinds[name] == 'number':
+            return np.asarray(self.arrays[name][positions])
+
+        # Slicing a memoryview of the bytes is far cheaper than slicing the memmap once per row
+        values, offsets, extra = self.arrays[name]
+        buffer = memoryview(values)
+        taken = np.empty(len(positions), dtype=object)
+        if self.kinds[name] == 'list':
+            for i, (start, end) in enumerate(zip(extra[positions].tolist(), extra[positions + 1].tolist())):
+                bounds = offsets[start:end + 1].tolist()
+                taken[i] = [str(buffer[a:b], 'utf-8') for a, b in zip(bounds[:-1], bounds[1:])]
+            return taken
+
+        present = np.ones(len(positions), dtype=bool) if extra is None else ~np.asarray(extra[positions])
+        for i, start, end in zip(np.flatnonzero(present).tolist(), offsets[positions[present]].tolist(),
+                                 offsets[positions[present] + 1].tolist()):
+            taken[i] = str(buffer[start:end], 'utf-8')
+        return taken
+
+    def __getitem__(self, name):
+        if self.kinds[name] == 'number':
+            return pd.Series(np.asarray(self.arrays[name]), name=name)
+
+        values, offsets, extra = self.arrays[name]
+        decoded = decode_strings(values, offsets)
+        if self.kinds[name] == 'list':
+            bounds = extra.tolist()
+            return pd.Series([decoded[start:end] for start, end in zip(bounds[:-1], bounds[1:])], name=name, dtype=object)
+
+        column = pd.Series(decoded, name=name, dtype=object)
+        if extra is not None:
+            column[np.asarray(extra)] = None
+        return column
+
+    # Every column decoded into a DataFrame (for offline jobs such as ingest):
+    def to_frame(self):
+        return pd.DataFrame({name: self[name] for name in self.kinds})
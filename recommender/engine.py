@@ -0,0 +1,388 @@
+import os
+import threading
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from .aliases import alias_dict, movie_aliases
+from .ann import N_PROBE, ann_neighbours, load_ann_index
+from .artifacts import (BASE_DIR, load_neighbours, load_pickle, load_sparse_matrix, save_array, save_pickle,
+                        save_sparse_matrix, stored_matrix_dtype)
+from .cache import LRUCache
+from .columns import SCHEMA_FILE, ColumnStore, parse_list, save_columns
+from .filters import build_filter_index, filter_mask, freeze_filters, validate_filters
+from .incremental import ingest, load_ingest_state, save_ingest_state
+from .metrics import METRICS, NO_REQUEST
+from .preprocess import vectorise
+from .ranking import (build_neighbour_file, neighbour_scores, profile_scores, similarity_row, top_n_indices, top_n_rows,
+                      top_neighbours)
+from .results import GAME_RESULT_FIELDS, MOVIE_RESULT_FIELDS, materialise_results
+from .titles import build_title_index, clean_title, extend_title_index, match_title
+
+RECOMMENDATION_CACHE_SIZE = 1024
+NEGATIVE_WEIGHT = 0.5           # Default weight of the negative examples in recommend_profile
+BATCH_BLOCK_SIZE = 512          # Seeds scored per sparse matrix product in recommend_batch
+
+# Result of recommend_batch:
+#   seeds   - row id of every seed (-1 if it did not resolve)
+#   indices - (seeds x top_n) int32 row ids of the recommendations (-1 padding)
+#   scores  - (seeds x top_n) float32 similarity scores (NaN padding)
+BatchResult = namedtuple('BatchResult', ['seeds', 'indices', 'scores'])
+
+
+# Raised by recommend_title when no title matches the user input:
+class TitleNotFound(ValueError):
+    pass
+
+
+# Content-based recommender for one catalogue. Artifacts are loaded lazily on first use,
+# or explicitly with load() (e.g. to warm a worker before it takes traffic).
+class Recommender:
+    domain = None               # Name of the catalogue, also used as the artifact file prefix
+    noun = None                 # Item name used in error messages
+    metadata_file = None        # Pickled DataFrame of the notebooks, converted to <domain>_columns/ on first load
+    soup_column = None          # Cleaned text column the TF-IDF matrix was fitted on
+    aliases = {}
+    filter_columns = {}         # Filter name -> comma-separated metadata column (see filters.py)
+    result_fields = {}          # Result name -> metadata column (see results.py)
+    list_columns = ()           # Columns the notebooks' pickles hold as comma-joined strings, stored as lists
+
+    # use_ann serves recommendations from the approximate <domain>_ann index (built with python -m recommender.build_ann)
+    # instead of the neighbour table, for catalogues too large for exact top-K tables: the table is then neither
+    # loaded nor built.
+    # recommend() calls are instrumented into metrics (see metrics.py), shared by all recommenders by default
+    def __init__(self, base_dir=BASE_DIR, cache_size=RECOMMENDATION_CACHE_SIZE, use_ann=False, nprobe=N_PROBE,
+                 metrics=METRICS):
+        self.base_dir = base_dir
+        self.use_ann = use_ann
+        self.nprobe = nprobe
+        self.cache = LRUCache(cache_size)
+        self.metrics = metrics
+        self.loaded = False
+        self._load_lock = threading.Lock()
+
+        self.items = None           # Column store with the item metadata
+        self.matrix = None          # L2-normalised sparse TF-IDF matrix
+        self.neighbours = None      # Top-K neighbour table (None with use_ann)
+        self.titles = None          # Title lookup index
+        self.filter_index = None    # Attribute filter index
+        self.ann_index = None       # Approximate nearest-neighbour index (only with use_ann)
+
+    def missing_artifact(self, description):
+        return FileNotFoundError(f"{description} Build the {self.domain} artifacts with: "
+                                 f"python -m recommender.build {self.domain} --raw <raw CSV> (see README)")
+
+    # Item metadata from <domain>_columns/, converted once from the pickled DataFrame when only that exists.
+    # The joined list columns are split during the conversion, so requests do not split strings
+    def load_items(self):
+        columns_dir = os.path.join(self.base_dir, f"{self.domain}_columns")
+        if not os.path.exists(os.path.join(columns_dir, SCHEMA_FILE)):
+            metadata_path = os.path.join(self.base_dir, self.metadata_file)
+            if not os.path.exists(metadata_path):
+                raise self.missing_artifact(f"Neither {columns_dir} nor {metadata_path} exists.")
+            items = load_pickle(metadata_path)
+            for column in self.list_columns:
+                if column in items:
+                    items[column] = items[column].apply(parse_list, separator=',')
+            save_columns(columns_dir, items)
+        return ColumnStore(columns_dir)
+
+    # TF-IDF matrix and neighbour table (None with use_ann). Deployments that only have the notebooks' pickles get them built once
+    # from the soup column of the metadata, with the same fit as the vectorise stage of python -m recommender.build
+    # (this needs scikit-learn, and the neighbour table takes a while for a large catalogue):
+    def load_similarity(self):
+        tfidf_dir = os.path.join(self.base_dir, f"{self.domain}_tfidf")
+        neighbours_file = os.path.join(self.base_dir, f"{self.domain}_neighbours.npy")
+        if not os.path.exists(os.path.join(tfidf_dir, "shape.npy")):
+            if self.soup_column not in self.items:
+                raise self.missing_artifact(f"{tfidf_dir} is missing and the metadata has no {self.soup_column} "
+                                            f"column to build it from.")
+            try:
+                vectorizer, matrix = vectorise(pd.DataFrame({self.soup_column: self.items[self.soup_column].fillna('')}),
+                                             self.soup_column)
+            except ImportError as e:
+                raise self.missing_artifact(f"{tfidf_dir} is missing and building it needs scikit-learn ({e}).")
+            save_sparse_matrix(tfidf_dir, matrix)
+            save_pickle(os.path.join(self.base_dir, f"{self.domain}_vectorizer.pkl"), vectorizer)
+
+        matrix = load_sparse_matrix(tfidf_dir)
+        if self.use_ann:
+            return matrix, None
+        if not os.path.exists(neighbours_file):
+            build_neighbour_file(matrix, neighbours_file)
+        return matrix, load_neighbours(neighbours_file)
+
+    # Load all artifacts (only once, concurrent callers wait for the first load):
+    def load(self):
+        with self._load_lock:
+            if self.loaded:
+                return self
+
+            self.items = self.load_items()
+            self.matrix, self.neighbours = self.load_similarity()
+            self.titles = build_title_index(self.items['title_clean'], self.items['release_date'], self.aliases)
+            self.filter_index = build_filter_index(self.items, self.filter_columns)
+            if self.use_ann:
+                self.ann_index = load_ann_index(os.path.join(self.base_dir, f"{self.domain}_ann"))
+            self.loaded = True
+        return self
+
+    # Resolve user input to (row id, matched title, score), or None if nothing matches:
+    # (request times the stages and records how the title matched, see metrics.py)
+    def resolve_title(self, user_input, request=NO_REQUEST):
+        if not self.loaded:
+            self.load()
+
+        with request.span('normalise'):
+            query = clean_title(user_input)
+        with request.span('alias'):
+            alias_target = self.titles['aliases'].get(query)
+            query = alias_target or query
+        if not query:
+            request.match('failed')
+            return None
+
+        with request.span('match'):
+            match_result = match_title(self.titles, query)
+        if match_result is None:
+            request.match('failed')
+        elif alias_target is not None:
+            request.match('alias', match_result[2])
+        elif query in self.titles['exact']:
+            request.match('exact', match_result[2])
+        else:
+            request.match('fuzzy', match_result[2])
+        return match_result
+
+    # Best top_n (index, score) pairs for an item, excluding the item itself and every item outside the mask.
+    # With use_ann they come from the ANN index, except for titles ingested after it was built, which are scored
+    # against the whole catalogue (there is no neighbour table to serve them from)
+    def item_neighbours(self, idx, top_n, mask=None):
+        if top_n < 1:
+            raise ValueError(f"top_n must be at least 1, got {top_n}.")
+        if self.ann_index is not None and idx < len(self.ann_index['embeddings']):
+            return ann_neighbours(self.ann_index, self.matrix, idx, top_n, mask=mask, nprobe=self.nprobe)
+        if self.neighbours is None:
+            sim_scores = similarity_row(self.matrix, idx)
+            return [(int(i), float(sim_scores[i])) for i in top_n_indices(sim_scores, top_n, exclude=[idx], mask=mask)]
+        return top_neighbours(self.neighbours, self.matrix, idx, top_n, mask=mask)
+
+    # Recommendations for a resolved item, keyed on the item id so aliases and misspellings share an entry.
+    # Filters (e.g. {'language': 'Hindi', 'year_min': 2015}) are applied before the top-N selection,
+    # so a filtered request still returns top_n items whenever enough of the catalogue matches:
+    def recommend_item(self, idx, top_n=10, filters=None, request=NO_REQUEST):
+        if not self.loaded:
+            self.load()
+
+        # Filters are validated before they are frozen into the cache key, so bad values get a clear error
+        validate_filters(self.filter_index, filters)
+        key = (self.domain, idx, top_n, freeze_filters(filters))
+        results = self.cache.get(key)
+        if results is None:
+            request.cache('miss')
+            with request.span('neighbours'):
+                similar_idx = self.item_neighbours(idx, top_n, filter_mask(self.filter_index, filters))
+            with request.span('materialise'):
+                results = materialise_results(self.items, self.result_fields, [i for i, _ in similar_idx])
+            self.cache.put(key, results)
+        else:
+            request.cache('hit')
+
+        # Hand out a copy of the list so callers cannot change the cached entry
+        return list(results)
+
+    # Resolve titles (str) or row ids (int) to row ids, -1 for anything that does not resolve:
+    def resolve_many(self, seeds):
+        if not self.loaded:
+            self.load()
+
+        resolved = {}
+        ids = np.full(len(seeds), -1, dtype=np.int64)
+        for position, seed in enumerate(seeds):
+            if isinstance(seed, (int, np.integer)):
+                if 0 <= seed < len(self.items):
+                    ids[position] = seed
+            elif isinstance(seed, str):
+                # Repeated titles are only resolved once
+                if seed not in resolved:
+                    match_result = self.resolve_title(seed)
+                    resolved[seed] = match_result[0] if match_result is not None else -1
+                ids[position] = resolved[seed]
+        return ids
+
+    # Top-N neighbours for many seeds (titles or row ids) at once, as compact arrays (see BatchResult).
+    # Served from the neighbour table when it covers top_n, otherwise seeds are scored in blocks with one
+    # sparse product per block and selected row-wise with argpartition. With use_ann every seed is served like
+    # recommend() (item_neighbours), since blocks of catalogue-wide scores are what the ANN index avoids
+    def recommend_batch(self, seeds, top_n=10, block_size=BATCH_BLOCK_SIZE):
+        if top_n < 1:
+            raise ValueError(f"top_n must be at least 1, got {top_n}.")
+        ids = self.resolve_many(seeds)
+        indices = np.full((len(ids), top_n), -1, dtype=np.int32)
+        scores = np.full((len(ids), top_n), np.nan, dtype=np.float32)
+        valid = np.flatnonzero(ids >= 0)
+
+        if self.use_ann:
+            for position in valid:
+                similar_idx = self.item_neighbours(int(ids[position]), top_n)
+                indices[position, :len(similar_idx)] = [i for i, _ in similar_idx]
+                scores[position, :len(similar_idx)] = [score for _, score in similar_idx]
+            return BatchResult(ids, indices, scores)
+
+        if top_n <= self.neighbours.shape[1]:
+            table = self.neighbours[ids[valid], :top_n]
+            indices[valid] = table['index']
+            scores[valid] = np.where(table['index'] >= 0, neighbour_scores(table), np.nan)
+            return BatchResult(ids, indices, scores)
+
+        for start in range(0, len(valid), block_size):
+            block = valid[start:start + block_size]
+            block_scores = (self.matrix[ids[block]] @ self.matrix.T).toarray()
+            top, top_scores = top_n_rows(block_scores, top_n, exclude=ids[block])
+            indices[block, :top.shape[1]] = top
+            scores[block, :top.shape[1]] = top_scores
+        return BatchResult(ids, indices, scores)
+
+    # Recommendations for a taste profile (e.g. a watch / play history), or {'Error': message}.
+    # The seed rows are combined into one weighted profile vector, negative examples are subtracted,
+    # and the catalogue is scored once against it. Seeds and negatives are left out of the results
+    def recommend_profile(self, seeds, weights=None, negatives=(), negative_weight=NEGATIVE_WEIGHT, top_n=10, filters=None):
+        try:
+            if not seeds:
+                raise ValueError(f"Please add at least one {self.noun.lower()} to get recommendations.")
+            if top_n < 1:
+                raise ValueError(f"top_n must be at least 1, got {top_n}.")
+            if weights is None:
+                weights = [1.0] * len(seeds)
+            if len(weights) != len(seeds):
+                raise ValueError("Please give one weight per seed.")
+
+            seed_ids = self.resolve_many(seeds)
+            negative_ids = self.resolve_many(negatives)
+            if not (seed_ids >= 0).any():
+                raise ValueError(f"None of the {self.noun.lower()}s are updated in the data. They will be added in future update of application.")
+
+            # Seeds that did not resolve are skipped
+            ids = np.concatenate([seed_ids, negative_ids])
+            profile_weights = np.concatenate([np.asarray(weights, dtype=np.float64),
+                                              np.full(len(negative_ids), -negative_weight)])
+            resolved = ids >= 0
+            ids, profile_weights = ids[resolved], profile_weights[resolved]
+
+            sim_scores = profile_scores(self.matrix, ids, profile_weights)
+            if sim_scores is None:
+                raise ValueError("The seeds and negative examples cancel out, please add more titles.")
+
+            similar_idx = top_n_indices(sim_scores, top_n, exclude=ids, mask=filter_mask(self.filter_index, filters))
+            return materialise_results(self.items, self.result_fields, similar_idx)
+
+        except ValueError as ve:
+            return {'Error': str(ve)}
+
+        except Exception as e:
+            return {'Error': f'An unexpected error occurred: {str(e)}'}
+
+    # Append new titles (a DataFrame with the metadata columns) without a full rebuild, see incremental.py.
+    # The updated artifacts are written next to the old ones and served right away; returns the ingest report
+    def ingest(self, new_items):
+        if not self.loaded:
+            self.load()
+
+        with self._load_lock:
+            vectorizer = load_pickle(os.path.join(self.base_dir, f"{self.domain}_vectorizer.pkl"))
+            state_file = os.path.join(self.base_dir, f"{self.domain}_ingest.json")
+            tfidf_dir = os.path.join(self.base_dir, f"{self.domain}_tfidf")
+            start = len(self.items)
+            neighbours_file = os.path.join(self.base_dir, f"{self.domain}_neighbours.npy")
+
+            # With use_ann the neighbour table is not served, but one on disk is still kept in step with the catalogue
+            neighbours = self.neighbours
+            if neighbours is None and os.path.exists(neighbours_file):
+                neighbours = load_neighbours(neighbours_file)
+
+            # List columns of the new titles (e.g. stringified lists from a CSV) are parsed like the catalogue's
+            new_items = new_items.copy()
+            for column in self.items.columns:
+                if self.items.kinds[column] == 'list' and column in new_items:
+                    new_items[column] = new_items[column].apply(parse_list)
+
+            # Lists are merged at full precision and written back in the dtypes the artifacts were built with
+            items, matrix, neighbours, state, report = ingest(
+                self.items.to_frame(), self.matrix, neighbours, vectorizer, new_items, self.soup_column,
+                load_ingest_state(state_file, start))
+
+            save_columns(self.items.dir_path, items)
+            save_sparse_matrix(tfidf_dir, matrix, stored_matrix_dtype(tfidf_dir))
+            if neighbours is not None:
+                save_array(neighbours_file, neighbours)
+            save_ingest_state(state_file, state)
+
+            # Swap in the new state, the title index last so new titles only resolve once everything else is in place
+            self.matrix = matrix
+            self.items = ColumnStore(self.items.dir_path)
+            self.filter_index = build_filter_index(items, self.filter_columns)
+            self.neighbours = None if self.use_ann else neighbours
+            self.titles = extend_title_index(self.titles, items['title_clean'], items['release_date'], start)
+            self.cache.clear()
+        return report
+
+    # Recommendations for a title typed by the user. Raises ValueError for bad input (empty input, unknown filters),
+    # TitleNotFound when no title matches and any other error for internal failures; the request records the error
+    def recommend_title(self, user_input, top_n=10, filters=None):
+        with self.metrics.request(self.domain) as request:
+            # Validate user input
+            if not isinstance(user_input, str) or not user_input.lower().strip():
+                request.match('failed')
+                raise ValueError(f"User input must not be empty. Please add a {self.noun.lower()} to get recommendations.")
+
+            # Resolve the title through the title index (alias / exact hit, otherwise fuzzy match)
+            match_result = self.resolve_title(user_input, request)
+            if match_result is None:
+                raise TitleNotFound(f"{self.noun} {user_input} is not updated in the data. It will be added in future update of application.")
+
+            idx, best_match, _ = match_result
+            request.fields['best_match'] = best_match
+
+            # Ensure that idx is valid
+            if idx < 0 or idx >= len(self.items):
+                raise IndexError(f"Index {idx} is out of range.")
+
+            # Get the most similar titles (excluding the title itself), served from the cache on repeats
+            return self.recommend_item(idx, top_n, filters, request)
+
+    # Recommendations for a title typed by the user, or {'Error': message}:
+    def recommend(self, user_input, top_n=10, filters=None):
+        try:
+            return self.recommend_title(user_input, top_n, filters)
+
+        except ValueError as ve:
+            return {'Error': str(ve)}
+
+        except IndexError as ie:
+            return {'Error': f'Index error: {str(ie)}'}
+
+        except Exception as e:
+            return {'Error': f'An unexpected error occurred: {str(e)}'}
+
+
+class MovieRecommender(Recommender):
+    domain = 'movies'
+    noun = 'Movie'
+    metadata_file = 'movies_recommended.pkl'
+    soup_column = 'final_soup'
+    aliases = movie_aliases
+    filter_columns = {'genre': 'genres', 'language': 'languages'}
+    result_fields = MOVIE_RESULT_FIELDS
+    list_columns = ('top_cast', 'cast_profile_path')
+
+
+class GameRecommender(Recommender):
+    domain = 'games'
+    noun = 'Game'
+    metadata_file = 'games_recommended.pkl'
+    soup_column = 'cleaned_soup'
+    aliases = alias_dict
+    filter_columns = {'genre': 'genres', 'platform': 'platforms', 'esrb_rating': 'esrb_rating', 'tag': 'tags'}
+    result_fields = GAME_RESULT_FIELDS
+    list_columns = ('screenshots', 'store_name', 'store_domain')
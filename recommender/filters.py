@@ -0,0 +1,84 @@
+from numbers import Real
+
+import numpy as np
+import pandas as pd
+
+# Attribute filters are answered from indexes built once per catalogue, so a filtered request
+# only builds a boolean mask over the catalogue and applies it before the top-N selection:
+#   - list / category columns ("Action, Drama") map every lower-cased value to the sorted row ids holding it
+#   - the release year and the rating are kept as float arrays (NaN when unknown)
+
+NO_ROWS = np.empty(0, dtype=np.int32)
+
+
+# Sorted row ids per value of a comma-separated column:
+def build_value_postings(column):
+    postings = {}
+    for row, values in enumerate(column):
+        if not isinstance(values, str):
+            continue
+        for value in {value.strip().lower() for value in values.split(',')}:
+            if value:
+                postings.setdefault(value, []).append(row)
+    return {value: np.array(rows, dtype=np.int32) for value, rows in postings.items()}
+
+
+# Filter index for a catalogue. value_columns maps filter name -> metadata column, e.g. {'genre': 'genres'}:
+def build_filter_index(items, value_columns):
+    return {
+        'size': len(items),
+        'values': {name: build_value_postings(items[column]) for name, column in value_columns.items()},
+        'year': items['release_date'].astype(str).str.extract(r'(\d{4})')[0].astype(float).to_numpy(),
+        'rating': pd.to_numeric(items['rating'], errors='coerce').to_numpy(dtype=np.float64)
+    }
+
+
+# Hashable form of a validated filter dict, used in cache keys. Value lists are sorted, so the same filters
+# (e.g. a set, whatever its iteration order) always give the same key:
+def freeze_filters(filters):
+    if not filters:
+        return None
+    return tuple(sorted((name, tuple(sorted(value)) if isinstance(value, (list, tuple, set)) else value)
+                        for name, value in filters.items()))
+
+
+# Bound filters and their inclusive comparison against the index:
+BOUND_FILTERS = {'year_min': ('year', np.greater_equal), 'year_max': ('year', np.less_equal),
+                 'min_rating': ('rating', np.greater_equal)}
+
+
+# Check the names and value types of filters without touching the catalogue. Value filters take one string or a
+# list of strings (any of them matches); year_min / year_max and min_rating take a number (inclusive bounds).
+# Unknown filter names and values of the wrong type raise ValueError
+def validate_filters(filter_index, filters):
+    for name, wanted in (filters or {}).items():
+        if name in filter_index['values']:
+            wanted = [wanted] if isinstance(wanted, str) else wanted
+            if not isinstance(wanted, (list, tuple, set)) or not all(isinstance(value, str) for value in wanted):
+                raise ValueError(f"Filter '{name}' takes a string or a list of strings.")
+        elif name in BOUND_FILTERS:
+            if isinstance(wanted, bool) or not isinstance(wanted, Real) or not np.isfinite(wanted):
+                raise ValueError(f"Filter '{name}' takes a number.")
+        else:
+            supported = sorted(filter_index['values']) + list(BOUND_FILTERS)
+            raise ValueError(f"Unknown filter '{name}'. Supported filters: {', '.join(supported)}.")
+
+
+# Boolean mask of the rows passing every filter (None when there is nothing to filter on), see validate_filters:
+def filter_mask(filter_index, filters):
+    if not filters:
+        return None
+
+    validate_filters(filter_index, filters)
+    mask = np.ones(filter_index['size'], dtype=bool)
+    for name, wanted in filters.items():
+        if name in filter_index['values']:
+            postings = filter_index['values'][name]
+            matches = np.zeros(filter_index['size'], dtype=bool)
+            for value in [wanted] if isinstance(wanted, str) else wanted:
+                matches[postings.get(value.strip().lower(), NO_ROWS)] = True
+            mask &= matches
+        else:
+            column, compare = BOUND_FILTERS[name]
+            mask &= compare(filter_index[column], wanted)
+    return mask
@@ -0,0 +1,125 @@
+# Incremental catalogue updates.
+#
+# New titles are transformed with the frozen vocabulary of the fitted vectorizer (<domain>_vectorizer.pkl,
+# saved by the recommendation notebooks) and appended to the TF-IDF matrix and the metadata. Only the
+# neighbour lists that change are recomputed: the lists of the new titles, and the lists of existing
+# titles that a new title beats at the K-th entry. A daily refresh of a few hundred titles therefore
+# costs a few sparse products instead of an N x N rebuild.
+#
+# The vocabulary and IDF weights stay frozen, so every ingest also tracks how many tokens of the new
+# titles are out of vocabulary and how much the catalogue has grown since the fit; past either threshold
+# a full refit (python -m recommender.build <domain>) is recommended.
+# Titles are ingested with python -m recommender.ingest (see ingest.py) or Recommender.ingest().
+
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from .quantise import quantise_neighbours
+from .ranking import (PADDING_INDEX, UINT8_SCORE_SCALE, build_neighbour_table, neighbour_scores, neighbours_dtype,
+                      top_n_rows)
+
+REFIT_OOV_RATE = 0.2        # Share of out-of-vocabulary tokens in the ingested titles that triggers a refit
+REFIT_GROWTH = 0.2          # Growth of the catalogue since the vectorizer was fitted that triggers a refit
+MERGE_BLOCK_SIZE = 512      # Affected rows recomputed per sparse matrix product
+
+
+# Token and out-of-vocabulary token counts of texts under the vectorizer's analyzer:
+def oov_counts(vectorizer, texts):
+    analyzer = vectorizer.build_analyzer()
+    vocabulary = vectorizer.vocabulary_
+    tokens = oov = 0
+    for text in texts:
+        terms = analyzer(text if isinstance(text, str) else '')
+        tokens += len(terms)
+        oov += sum(term not in vocabulary for term in terms)
+    return tokens, oov
+
+
+# Merge the rows from start on into the neighbour lists of the rows before start (in the dtype of the table).
+# Returns the updated lists and the ids of the rows whose list changed.
+# A list changes when a new row scores at least its K-th entry. The stored scores are rounded, so rows within one
+# quantisation step of it are taken too, and every affected row is recomputed from scratch into float32 scores and
+# quantised once to the stored dtype, as the build writes the table. The lists therefore come out as a full rebuild would write them
+def merge_neighbours(neighbours, matrix, start, block_size=MERGE_BLOCK_SIZE):
+    k = neighbours.shape[1]
+    tolerance = UINT8_SCORE_SCALE if neighbours['score'].dtype == np.uint8 else float(np.finfo(np.float16).eps)
+
+    # Rows with empty entries (catalogues with K items or fewer) take any new row
+    cross = matrix[:start] @ matrix[start:].T
+    best_new = cross.max(axis=1).toarray().ravel()
+    padded = neighbours['index'][:start, -1] < 0
+    affected = np.flatnonzero((best_new >= neighbour_scores(neighbours[:start, -1]) - tolerance) | padded)
+
+    merged = np.array(neighbours)
+    transposed = matrix.T.tocsr()
+    for block_start in range(0, len(affected), block_size):
+        rows = affected[block_start:block_start + block_size]
+        top, top_scores = top_n_rows((matrix[rows] @ transposed).toarray(), k, exclude=rows, copy=False)
+        recomputed = np.empty((len(rows), k), dtype=neighbours_dtype('float32'))
+        recomputed['index'][:, :top.shape[1]] = top
+        recomputed['score'][:, :top.shape[1]] = top_scores
+        recomputed['index'][:, top.shape[1]:] = PADDING_INDEX
+        recomputed['score'][:, top.shape[1]:] = 0
+        merged[rows] = quantise_neighbours(recomputed, neighbours['score'].dtype.name)
+    return merged, affected
+
+
+# Drift bookkeeping kept next to the artifacts in <domain>_ingest.json:
+def load_ingest_state(file_path, n_items):
+    if os.path.exists(file_path):
+        with open(file_path) as f:
+            return json.load(f)
+    # No ingest since the last fit
+    return {'fitted_items': n_items, 'ingested_items': 0, 'tokens': 0, 'oov_tokens': 0}
+
+
+def save_ingest_state(file_path, state):
+    with open(file_path, 'w') as f:
+        json.dump(state, f, indent=2)
+
+
+# Append new titles to a catalogue, returns the updated (items, matrix, neighbours, state) and an ingest report.
+# new_items needs the metadata columns of the catalogue (<domain>_columns/), including the cleaned soup column.
+# Catalogues without a neighbour table (served from the ANN index) pass neighbours=None and get None back
+def ingest(items, matrix, neighbours, vectorizer, new_items, soup_column, state):
+    started = time.perf_counter()
+    missing = [column for column in items.columns if column not in new_items.columns]
+    if missing:
+        raise ValueError(f"New titles are missing the columns: {', '.join(missing)}")
+
+    start = len(items)
+    new_items = new_items[items.columns]
+    new_rows = vectorizer.transform(new_items[soup_column]).astype(matrix.dtype)
+
+    items = pd.concat([items, new_items], ignore_index=True)
+    matrix = sparse.vstack([matrix, new_rows], format='csr')
+    affected = []
+    if neighbours is not None:
+        merged, affected = merge_neighbours(neighbours, matrix, start)
+        new_lists = build_neighbour_table(matrix, neighbours.shape[1], start=start, score_dtype='float32')
+        neighbours = np.concatenate([merged, quantise_neighbours(new_lists, neighbours['score'].dtype.name)])
+
+    tokens, oov = oov_counts(vectorizer, new_items[soup_column])
+    state = dict(state,
+                 ingested_items=state['ingested_items'] + len(new_items),
+                 tokens=state['tokens'] + tokens,
+                 oov_tokens=state['oov_tokens'] + oov)
+    oov_rate = state['oov_tokens'] / state['tokens'] if state['tokens'] else 0.0
+    growth = state['ingested_items'] / state['fitted_items'] if state['fitted_items'] else 0.0
+    state['needs_refit'] = oov_rate > REFIT_OOV_RATE or growth > REFIT_GROWTH
+
+    report = {
+        'added': len(new_items),
+        'items': len(items),
+        'updated_lists': len(affected),
+        'oov_rate': round(oov_rate, 4),
+        'growth': round(growth, 4),
+        'needs_refit': state['needs_refit'],
+        'seconds': round(time.perf_counter() - started, 3)
+    }
+    return items, matrix, neighbours, state, report
@@ -0,0 +1,36 @@
+# Append new titles to a catalogue without a full rebuild (see incremental.py) and print the ingest report:
+#
+#   python -m recommender.ingest movies new_movies.csv
+
+import argparse
+import json
+
+import pandas as pd
+
+from .artifacts import BASE_DIR, load_pickle
+from .engine import GameRecommender, MovieRecommender
+
+
+def read_items(file_path):
+    if file_path.endswith('.csv'):
+        return pd.read_csv(file_path)
+    return load_pickle(file_path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Append new titles to a catalogue without a full rebuild.")
+    parser.add_argument('domain', choices=['movies', 'games'])
+    parser.add_argument('new_items', help="CSV or pickle with the metadata columns of the catalogue (<domain>_columns/)")
+    parser.add_argument('--base-dir', default=BASE_DIR)
+    args = parser.parse_args(argv)
+
+    recommender_class = MovieRecommender if args.domain == 'movies' else GameRecommender
+    report = recommender_class(args.base_dir).ingest(read_items(args.new_items))
+    print(json.dumps(report, indent=2))
+    if report['needs_refit']:
+        print(f"Vocabulary drift is past the threshold, rebuild for a full refit: python -m recommender.build {args.domain} "
+              f"--raw <raw CSV>")
+
+
+if __name__ == '__main__':
+    main()
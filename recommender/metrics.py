@@ -0,0 +1,325 @@
+# Lightweight instrumentation of the recommendation path.
+#
+# Every recommend() call is one request with span timers per stage (normalise, alias, match, neighbours,
+# materialise), the way its title was matched (alias / exact / fuzzy / failed) and the fuzzy match score.
+# Finished requests are
+#   - counted into counters and histograms, exported in the Prometheus text format (prometheus_text(),
+#     write_prometheus(file) or a local endpoint with start_metrics_server(port)); processes sharing one endpoint
+#     (the workers of a pre-forked server) write their counts with write_state and export the sum of all of them
+#     with combined_prometheus_text,
+#   - logged as one JSON line on the 'recommender' logger at INFO level (silent unless logging is configured).
+# A sampling profiler can be switched on (enable_profiler() or RECOMMENDER_PROFILE_INTERVAL=<seconds>); it samples
+# the stacks of the threads inside a request and attributes them to the current stage, as collapsed stacks
+# (flamegraph.pl / speedscope input).
+
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger('recommender')
+
+LATENCY_BUCKETS = [0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0]
+SCORE_BUCKETS = [50, 60, 70, 80, 90, 95, 100]
+PROFILE_INTERVAL = 0.005        # Seconds between two profiler samples
+MAX_STACK_DEPTH = 64
+
+METRIC_BUCKETS = {'recommender_request_seconds': LATENCY_BUCKETS,
+                  'recommender_stage_seconds': LATENCY_BUCKETS,
+                  'recommender_fuzzy_score': SCORE_BUCKETS}
+
+METRIC_HELP = {
+    'recommender_requests_total': ('counter', "Recommendation requests by outcome."),
+    'recommender_title_matches_total': ('counter', "How the title of a request was matched (alias / exact / fuzzy / failed)."),
+    'recommender_cache_total': ('counter', "Recommendation cache lookups by result."),
+    'recommender_request_seconds': ('histogram', "Latency of recommendation requests."),
+    'recommender_stage_seconds': ('histogram', "Latency of the stages of a recommendation request."),
+    'recommender_fuzzy_score': ('histogram', "Score of the fuzzy title matches."),
+}
+
+
+def format_labels(labels):
+    return ','.join(f'{name}="{value}"' for name, value in labels)
+
+
+# Prometheus text exposition of counters ((name, labels) -> value) and histograms ((name, labels) -> bucket counts,
+# +Inf count and sum):
+def format_prometheus(counters, histograms):
+    lines = []
+    for name, (kind, help_text) in METRIC_HELP.items():
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+        for (metric, labels), value in sorted(counters.items()):
+            if metric == name:
+                lines.append(f"{name}{{{format_labels(labels)}}} {value}")
+        for (metric, labels), counts in sorted(histograms.items()):
+            if metric != name:
+                continue
+            cumulative = 0
+            for bound, count in zip(METRIC_BUCKETS[name] + ['+Inf'], counts[:-1]):
+                cumulative += count
+                lines.append(f"{name}_bucket{{{format_labels(labels + (('le', bound),))}}} {cumulative}")
+            lines.append(f"{name}_sum{{{format_labels(labels)}}} {counts[-1]}")
+            lines.append(f"{name}_count{{{format_labels(labels)}}} {cumulative}")
+    return '\n'.join(lines) + '\n'
+
+
+# Prometheus text of the sum of the metrics states written by several processes (see Metrics.write_state).
+# Every process only adds to its own file and the files of processes that exited stay, so the sums never go down
+def combined_prometheus_text(file_paths):
+    counters, histograms = Counter(), {}
+    for file_path in file_paths:
+        try:
+            with open(file_path) as f:
+                state = json.load(f)
+        except (FileNotFoundError, ValueError):
+            continue
+        for name, labels, value in state['counters']:
+            counters[(name, tuple(map(tuple, labels)))] += value
+        for name, labels, counts in state['histograms']:
+            total = histograms.setdefault((name, tuple(map(tuple, labels))), [0] * len(counts))
+            for i, count in enumerate(counts):
+                total[i] += count
+    return format_prometheus(counters, histograms)
+
+
+# Span timer of one stage, see Request.span:
+class Span:
+    def __init__(self, request, stage):
+        self.request = request
+        self.stage = stage
+
+    def __enter__(self):
+        self.previous_stage = self.request.metrics.set_stage(self.stage)
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.request.stages[self.stage] = self.request.stages.get(self.stage, 0.0) + time.perf_counter() - self.started
+        self.request.metrics.set_stage(self.previous_stage)
+        return False
+
+
+# One recommendation request, used as a context manager around it. fields end up in the JSON log line
+class Request:
+    def __init__(self, metrics, domain):
+        self.metrics = metrics
+        self.domain = domain
+        self.stages = {}
+        self.fields = {}
+
+    def span(self, stage):
+        return Span(self, stage)
+
+    def match(self, kind, score=None):
+        self.fields['match'] = kind
+        if score is not None:
+            self.fields['score'] = round(float(score), 2)
+
+    def cache(self, result):
+        self.fields['cache'] = result
+
+    def __enter__(self):
+        self.previous_stage = self.metrics.set_stage('request')
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        seconds = time.perf_counter() - self.started
+        self.metrics.set_stage(self.previous_stage)
+        if exc_type is not None:
+            self.fields['error'] = repr(exc_value)
+        self.metrics.record(self, seconds)
+        return False
+
+
+# Request that records nothing, for calls outside recommend() (e.g. resolve_many):
+class NoRequest:
+    def span(self, stage):
+        return NO_SPAN
+
+    def match(self, kind, score=None):
+        pass
+
+    def cache(self, result):
+        pass
+
+
+class NoSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+NO_SPAN = NoSpan()
+NO_REQUEST = NoRequest()
+
+
+# Counters and histograms of the finished requests, plus the optional sampling profiler:
+class Metrics:
+    def __init__(self):
+        self.counters = Counter()           # (name, labels) -> value
+        self.histograms = {}                # (name, labels) -> [bucket counts..., +Inf count, sum]
+        self.buckets = METRIC_BUCKETS
+        self._lock = threading.Lock()
+        self.profiler = None
+        self.stages = {}                    # Thread id -> current stage, only tracked while profiling
+
+        interval = os.environ.get('RECOMMENDER_PROFILE_INTERVAL')
+        if interval:
+            self.enable_profiler(float(interval))
+
+    def request(self, domain):
+        return Request(self, domain)
+
+    # Current stage of the calling thread for the profiler, returns the previous one:
+    def set_stage(self, stage):
+        if self.profiler is None:
+            return None
+        thread_id = threading.get_ident()
+        previous = self.stages.get(thread_id)
+        if stage is None:
+            self.stages.pop(thread_id, None)
+        else:
+            self.stages[thread_id] = stage
+        return previous
+
+    def observe(self, name, labels, value):
+        buckets = self.buckets[name]
+        counts = self.histograms.setdefault((name, labels), [0] * (len(buckets) + 2))
+        counts[bisect_left(buckets, value)] += 1
+        counts[-1] += value
+
+    def record(self, request, seconds):
+        domain = ('domain', request.domain)
+        with self._lock:
+            self.counters[('recommender_requests_total', (domain, ('outcome', 'error' if 'error' in request.fields else 'ok')))] += 1
+            if 'match' in request.fields:
+                self.counters[('recommender_title_matches_total', (domain, ('match', request.fields['match'])))] += 1
+            if request.fields.get('match') == 'fuzzy':
+                self.observe('recommender_fuzzy_score', (domain,), request.fields['score'])
+            if 'cache' in request.fields:
+                self.counters[('recommender_cache_total', (domain, ('result', request.fields['cache'])))] += 1
+            self.observe('recommender_request_seconds', (domain,), seconds)
+            for stage, stage_seconds in request.stages.items():
+                self.observe('recommender_stage_seconds', (domain, ('stage', stage)), stage_seconds)
+
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(json.dumps(dict({'event': 'recommend', 'domain': request.domain,
+                                         'total_ms': round(seconds * 1000, 3),
+                                         'stages_ms': {stage: round(stage_seconds * 1000, 3)
+                                                       for stage, stage_seconds in request.stages.items()}},
+                                        **request.fields)))
+
+    # Snapshot of all metrics in the Prometheus text exposition format:
+    def prometheus_text(self):
+        with self._lock:
+            counters = dict(self.counters)
+            histograms = {key: list(counts) for key, counts in self.histograms.items()}
+        return format_prometheus(counters, histograms)
+
+    # Written atomically, for scrapers reading a file (e.g. the node exporter textfile collector):
+    def write_prometheus(self, file_path):
+        tmp_path = f"{file_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            f.write(self.prometheus_text())
+        os.replace(tmp_path, file_path)
+
+    # Counters and histograms as JSON, written atomically, for combined_prometheus_text in another process:
+    def write_state(self, file_path):
+        with self._lock:
+            state = {'counters': [[name, labels, value] for (name, labels), value in self.counters.items()],
+                     'histograms': [[name, labels, counts] for (name, labels), counts in self.histograms.items()]}
+        tmp_path = f"{file_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, file_path)
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+    def enable_profiler(self, interval=PROFILE_INTERVAL):
+        if self.profiler is None:
+            self.profiler = SamplingProfiler(self, interval)
+            self.profiler.start()
+        return self.profiler
+
+    def disable_profiler(self):
+        profiler, self.profiler = self.profiler, None
+        if profiler is not None:
+            profiler.stop()
+        self.stages.clear()
+        return profiler
+
+
+# Samples the stacks of the threads inside a request every interval seconds (sys._current_frames),
+# counted per "stage;outermost frame;...;innermost frame":
+class SamplingProfiler:
+    def __init__(self, metrics, interval=PROFILE_INTERVAL):
+        self.metrics = metrics
+        self.interval = interval
+        self.samples = Counter()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self.run, name='recommender-profiler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._thread.join()
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            frames = sys._current_frames()
+            for thread_id, stage in list(self.metrics.stages.items()):
+                frame = frames.get(thread_id)
+                stack = []
+                while frame is not None and len(stack) < MAX_STACK_DEPTH:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                    frame = frame.f_back
+                if stack:
+                    self.samples[';'.join([stage] + stack[::-1])] += 1
+
+    # Collapsed stacks, one "stack count" line per distinct stack:
+    def collapsed(self):
+        return ''.join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+    def write(self, file_path):
+        with open(file_path, 'w') as f:
+            f.write(self.collapsed())
+
+
+# Serve the Prometheus snapshot of metrics on http://host:port/metrics from a daemon thread:
+def start_metrics_server(metrics, port, host='127.0.0.1'):
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path != '/metrics':
+                self.send_error(404)
+                return
+            body = metrics.prometheus_text().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, name='recommender-metrics', daemon=True).start()
+    return server
+
+
+# Metrics shared by every recommender of the process (unless one is given its own):
+METRICS = Metrics()
@@ -0,0 +1,208 @@
+# Data preparation steps of the recommendation notebooks (Notebooks/*_recommendation.ipynb) as functions,
+# used by the offline build pipeline (build.py).
+
+import ast
+import functools
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from .columns import parse_list
+from .titles import clean_title
+
+CHUNK_SIZE = 1000           # Texts per task sent to a worker process
+
+NLTK_RESOURCES = {'stopwords': 'corpora/stopwords', 'punkt': 'tokenizers/punkt', 'punkt_tab': 'tokenizers/punkt_tab',
+                  'wordnet': 'corpora/wordnet', 'omw-1.4': 'corpora/omw-1.4'}
+
+
+# ----------------------------- Loading
+
+# tmdb_movies.csv (from movies_data_collection.ipynb), plus the trailer keys when movie_trailers.csv is given.
+# The cast names and profile pictures are parsed into lists once here, instead of being split per request
+def load_movies(raw_path, trailers_path=None):
+    movies = pd.read_csv(raw_path)
+    for col in ['top_cast', 'cast_profile_path']:
+        movies[col] = movies[col].apply(parse_list)
+    if 'languages' not in movies:
+        movies['languages'] = movies['language'].map({'en': 'English', 'hi': 'Hindi'})
+    if trailers_path is not None:
+        trailers = pd.read_csv(trailers_path)[['id', 'video_key']]
+        movies = pd.merge(movies, trailers, how='left', on='id')
+    return movies
+
+
+# Games.csv (from games_collection.ipynb), plus the screenshots and platforms when their CSVs are given:
+def load_games(raw_path, screenshots_path=None, platforms_path=None):
+    games = pd.read_csv(raw_path)
+
+    # Handle 'not rated' for ratings and 'not available' for the other list columns
+    games['ratings'] = games['ratings'].replace('not rated', "['not rated']")
+    games['ratings'] = games['ratings'].apply(lambda x: ast.literal_eval(x) if isinstance(x, str) else x)
+    for col in ['developers', 'genres', 'tags', 'publishers', 'store']:
+        games[col] = games[col].replace('not available', "['not available']")
+        games[col] = games[col].apply(lambda x: ast.literal_eval(x) if isinstance(x, str) else x)
+
+    # Converting columns from list to normal strings
+    for col in ['ratings', 'developers', 'genres', 'tags', 'publishers']:
+        games[col] = games[col].apply(lambda x: ", ".join(x))
+
+    # Store name and store domain columns, as parallel lists
+    games['store_name'] = games['store'].apply(lambda x: [store[0] for store in x])
+    games['store_domain'] = games['store'].apply(lambda x: [store[1] for store in x])
+    games = games.drop(columns='store')
+
+    if screenshots_path is not None:
+        games = pd.merge(games, pd.read_csv(screenshots_path)[['id', 'screenshots']], how='left', on='id')
+        games['screenshots'] = games['screenshots'].apply(parse_list)
+    if platforms_path is not None:
+        platforms = pd.read_csv(platforms_path)[['id', 'platforms']]
+        platforms['platforms'] = platforms['platforms'].fillna('Information not available')
+        games = pd.merge(games, platforms, how='left', on='id')
+    return games
+
+
+# ----------------------------- Titles
+
+# title_clean column used to match the user input, optionally dropping rows whose title cleans to nothing:
+def add_clean_titles(items, drop_empty=False):
+    items = items.copy()
+    items['title_clean'] = items['title'].apply(clean_title)
+    if drop_empty:
+        items = items[items['title_clean'].str.strip().astype(bool)].reset_index(drop=True)
+    return items
+
+
+# ----------------------------- Soup
+
+# Stop words, lemmatizer and tokenizer of the notebooks (nltk is only needed to build, not to serve):
+def load_text_tools():
+    import nltk
+    from nltk.corpus import stopwords
+    from nltk.stem import WordNetLemmatizer
+
+    for resource, path in NLTK_RESOURCES.items():
+        try:
+            nltk.data.find(path)
+        except LookupError:
+            nltk.download(resource, quiet=True)
+    return set(stopwords.words('english')), WordNetLemmatizer(), nltk.word_tokenize
+
+
+# Lower-case, tokenize, drop stop words and lemmatize (clean_text in the notebooks):
+def clean_text(text, stop_words, lemmatize, tokenize):
+    tokens = tokenize(re.sub(r'\W', ' ', text.lower()))
+    filtered = [lemmatize(word) for word in tokens if word not in stop_words]
+    return ' '.join(filtered)
+
+
+# Text tools of the current process, loaded once. The vocabulary is far smaller than the token stream,
+# so lemmas are memoised per unique token (lemmatize is a pure function, the output does not change)
+@functools.lru_cache(maxsize=None)
+def process_text_tools():
+    stop_words, lemmatizer, tokenize = load_text_tools()
+    return stop_words, functools.lru_cache(maxsize=None)(lemmatizer.lemmatize), tokenize
+
+
+def clean_chunk(texts):
+    stop_words, lemmatize, tokenize = process_text_tools()
+    return [clean_text(text, stop_words, lemmatize, tokenize) for text in texts]
+
+
+def strip_non_english_chunk(texts):
+    return [remove_non_english(text) for text in texts]
+
+
+# Apply a chunk function to texts split into chunks, in a process pool when workers > 1.
+# Results are collected in chunk order, so the output is the same as a serial run
+def map_chunks(chunk_function, texts, workers=None, chunk_size=CHUNK_SIZE):
+    texts = list(texts)
+    chunks = [texts[start:start + chunk_size] for start in range(0, len(texts), chunk_size)]
+    workers = min(workers or os.cpu_count() or 1, len(chunks))
+
+    results = []
+    if workers <= 1:
+        for chunk in chunks:
+            results.extend(chunk_function(chunk))
+        return results
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for chunk_results in executor.map(chunk_function, chunks):
+            results.extend(chunk_results)
+    return results
+
+
+def clean_texts(texts, workers=None):
+    # Loaded (and the nltk data downloaded when missing) once in the parent before the pool starts, so workers
+    # never download into the same nltk_data directory at the same time; forked workers inherit the loaded tools
+    process_text_tools()
+    return map_chunks(clean_chunk, texts, workers)
+
+
+# Soup of genres, description, language, cast and keywords, cleaned and followed by the cast names:
+def build_movie_soup(movies, workers=None):
+    movies = movies.copy()
+    top_cast = movies['top_cast'].str.join(', ')
+    movies['soup'] = movies['genres'] + ' ' + movies['description'] + ' ' + movies['language'] + ' ' + top_cast + ' ' + movies['keywords']
+    movies['cleaned_soup'] = clean_texts(movies['soup'], workers)
+    movies['cleaned_cast'] = top_cast.str.lower().str.strip().str.replace(', ', ' ')
+    movies['final_soup'] = movies['cleaned_soup'] + ' ' + movies['cleaned_cast']
+    return movies
+
+
+# Rating label from the numeric rating, falling back to the RAWG ratings string:
+def map_rating(num, cat):
+    if pd.isna(num):
+        return cat if pd.notna(cat) else 'not available'
+    if num <= 1.59:
+        return 'skip'
+    elif 1.60 <= num <= 2.59:
+        return 'meh'
+    elif 2.60 <= num <= 4.59:
+        return 'recommended'
+    elif num > 4.60:
+        return 'exceptional'
+    else:
+        return cat if pd.notna(cat) else 'not available'
+
+
+# Drop the non-English sections RAWG appends to descriptions:
+def remove_non_english(text):
+    pattern = r'(?:\n|\s|^)(Español|Français|Deutsch|Português|Русский|日本語|中文|한국어|Italiano|Polski|Türkçe|العربية|हिन्दी|ไทย|繁體中文)(.|\n)*$'
+    return re.sub(pattern, '', text, flags=re.IGNORECASE).strip()
+
+
+# Remove newlines and '###' headers, then collapse whitespace:
+def clean_desc(text):
+    text = re.sub(r'(\r\n|\r|\n|###\w+)', ' ', text)
+    return re.sub(r'\s+', ' ', text).strip()
+
+
+# Soup of developers, genres, tags, publishers, description and rating label, cleaned; games without a title
+# or description are dropped and the release date is formatted for display:
+def build_game_soup(games, workers=None):
+    games = games.copy()
+    games['rating_label'] = [map_rating(num, cat) for num, cat in zip(games['rating'], games['ratings'])]
+    games['description_clean'] = map_chunks(strip_non_english_chunk, games['description'].fillna(''), workers)
+    games['soup'] = games['developers'] + " " + games['genres'] + " " + games['tags'] + " " + games['publishers'] + " " + games['description_clean'] + " " + games['rating_label']
+    games = games[games['description_clean'].str.strip().astype(bool)].reset_index(drop=True)
+    games['cleaned_soup'] = clean_texts(games['soup'], workers)
+
+    games['released'] = pd.to_datetime(games['released'], errors='coerce')
+    games['release_date'] = games['released'].dt.strftime('%d %b %Y').fillna('Not Available')
+    games['description_clean'] = games['description_clean'].apply(clean_desc)
+    return games
+
+
+# ----------------------------- Vectorising
+
+# TF-IDF fit on the soup column, returns (fitted vectorizer, L2-normalised CSR matrix):
+def vectorise(items, soup_column):
+    # scikit-learn is only needed to build, not to serve
+    from sklearn.feature_extraction.text import TfidfVectorizer
+
+    tfidf = TfidfVectorizer(stop_words='english')
+    matrix = tfidf.fit_transform(items[soup_column]).tocsr()
+    return tfidf, matrix
@@ -0,0 +1,93 @@
+# Storage dtypes for the similarity artifacts.
+#
+# Neighbour table scores (cosine similarities in [0, 1]) are stored as float32, float16 (default) or uint8 with a
+# fixed scale of 1/255. The table is built and sorted with float32 scores and quantised once when it is written, so ranking from it reads the stored
+# order directly and only the returned scores are dequantised.
+#
+# TF-IDF values are stored as float64 (default), float32, float16 or uint8 with one scale per row (row_scale.npy,
+# the row maximum / 255). float64 / float32 are memory-mapped as they are; float16 / uint8 are dequantised to float32
+# when loaded, since scipy.sparse has no float16 or integer-safe products.
+
+import numpy as np
+
+from .ranking import UINT8_SCORE_SCALE, neighbour_scores, neighbours_dtype, top_n_rows
+
+SCORE_DTYPES = ['float32', 'float16', 'uint8']
+TFIDF_DTYPES = ['float64', 'float32', 'float16', 'uint8']
+
+
+# Neighbour table with its scores stored as score_dtype:
+def quantise_neighbours(neighbours, score_dtype):
+    quantised = np.empty(neighbours.shape, dtype=neighbours_dtype(score_dtype))
+    quantised['index'] = neighbours['index']
+    # In float64, so that scores on a step boundary round the same whatever dtype the scores come in
+    scores = neighbour_scores(neighbours).astype(np.float64)
+    if np.dtype(score_dtype) == np.uint8:
+        quantised['score'] = np.clip(np.rint(scores / UINT8_SCORE_SCALE), 0, 255)
+    else:
+        quantised['score'] = scores
+    return quantised
+
+
+# Data array (and per-row scales for uint8, otherwise None) of a CSR matrix stored as dtype:
+def quantise_matrix_data(matrix, dtype):
+    dtype = np.dtype(dtype)
+    if dtype != np.uint8:
+        return matrix.data.astype(dtype), None
+
+    row_lengths = np.diff(matrix.indptr)
+    row_max = np.zeros(matrix.shape[0], dtype=np.float64)
+    non_empty = row_lengths > 0
+    row_max[non_empty] = np.maximum.reduceat(matrix.data, matrix.indptr[:-1][non_empty])
+    row_scale = np.where(row_max > 0, row_max / 255, 1.0).astype(np.float32)
+    data = np.rint(matrix.data / np.repeat(row_scale, row_lengths)).astype(np.uint8)
+    return data, row_scale
+
+
+# float32 data array of a quantised CSR matrix:
+def dequantise_matrix_data(data, indptr, row_scale=None):
+    data = np.asarray(data, dtype=np.float32)
+    if row_scale is not None:
+        data = data * np.repeat(np.asarray(row_scale, dtype=np.float32), np.diff(indptr))
+    return data
+
+
+# Effect of every storage dtype on the served top-k lists, over a sample of items, against full precision
+# (ties go to the lower index everywhere):
+#   scores - max / mean absolute error of the served (dequantised) scores against the exact cosine similarities.
+#            Like the build, the lists are ranked at full precision into a float32 table that is quantised once to
+#            each score dtype, so the served order is the full-precision order whatever the dtype
+#   tfidf  - share of top-k lists that change when the similarity scores are computed from the TF-IDF matrix
+#            stored as each TF-IDF dtype
+def quantisation_report(matrix, k=10, sample_size=2000, random_state=42):
+    from scipy import sparse
+
+    rng = np.random.default_rng(random_state)
+    sample = np.sort(rng.choice(matrix.shape[0], min(sample_size, matrix.shape[0]), replace=False))
+    exact, exact_scores = top_n_rows((matrix[sample] @ matrix.T).toarray(), k, exclude=sample)
+
+    table = np.empty(exact.shape, dtype=neighbours_dtype('float32'))
+    table['index'] = exact
+    table['score'] = exact_scores
+    report = {'items': int(len(sample)), 'k': k, 'scores': {}, 'tfidf': {}}
+    for dtype in SCORE_DTYPES:
+        served = neighbour_scores(quantise_neighbours(table, dtype)).astype(np.float64)
+        error = np.abs(served - exact_scores)
+        report['scores'][dtype] = {
+            'max_error': float(error.max(initial=0)),
+            'mean_error': float(error.mean()) if error.size else 0.0,
+        }
+
+    for dtype in TFIDF_DTYPES:
+        data, row_scale = quantise_matrix_data(matrix, dtype)
+        # As loaded: float64 / float32 as they are, float16 / uint8 dequantised to float32
+        if data.dtype not in (np.float64, np.float32):
+            data = dequantise_matrix_data(data, matrix.indptr, row_scale)
+        quantised = sparse.csr_matrix((data, matrix.indices, matrix.indptr), shape=matrix.shape)
+        top, _ = top_n_rows((quantised[sample] @ quantised.T).toarray(), k, exclude=sample)
+        report['tfidf'][dtype] = changed_share(top, exact)
+    return report
+
+
+def changed_share(top, exact):
+    return round(float(np.mean(np.any(top != exact, axis=1))), 4)
@@ -0,0 +1,162 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+NEIGHBOURS_K = 50               # Entries kept per row in the neighbour table
+NEIGHBOURS_DTYPE = np.dtype([('index', '<i4'), ('score', '<f2')])
+UINT8_SCORE_SCALE = 1 / 255     # Score of one step when the table stores uint8 scores (see quantise.py)
+PADDING_INDEX = -1              # Index of the empty entries of a neighbour table row
+BLOCK_MEMORY = 256 * 2**20      # Bytes of all blocks in flight together (with their temporaries) when building the table
+# Peak bytes per similarity score of a block: the sparse product (up to 12 bytes per entry) and its dense float64 copy
+# coexist during toarray(), then top_n_rows holds the dense scores, the negated copy and the argpartition indices
+BLOCK_BYTES_PER_SCORE = 36
+
+
+# Structured dtype of neighbour table entries: int32 index + score stored as score_dtype:
+def neighbours_dtype(score_dtype):
+    return np.dtype([('index', '<i4'), ('score', np.dtype(score_dtype).newbyteorder('<'))])
+
+
+# Scores (float32) of neighbour table entries, whatever dtype the table stores them as:
+def neighbour_scores(entries):
+    scores = np.asarray(entries['score'], dtype=np.float32)
+    if entries['score'].dtype == np.uint8:
+        scores *= UINT8_SCORE_SCALE
+    return scores
+
+
+# Cosine similarity of one item against the whole catalogue:
+def similarity_row(matrix, idx):
+    # Rows are L2-normalised, so the sparse dot product equals cosine_similarity
+    return (matrix @ matrix[idx].T).toarray().ravel()
+
+
+# Cosine similarity of a weighted combination of rows (a taste profile) against the whole catalogue:
+def profile_scores(matrix, ids, weights):
+    # Sum the weighted seed rows into one sparse profile vector and normalise it, so one sparse
+    # dot product scores the catalogue (negative weights push the profile away from a row)
+    profile = matrix[ids].T @ np.asarray(weights, dtype=np.float64)
+    norm = np.linalg.norm(profile)
+    if norm == 0:
+        return None
+    return matrix @ (profile / norm)
+
+
+# Indices of the top_n highest scores (ties broken by lower index), skipping the excluded indices
+# and, when a boolean mask is given, every index outside it:
+def top_n_indices(scores, top_n, exclude=(), mask=None):
+    scores = np.array(scores, dtype=np.float64)
+    exclude = np.asarray(exclude, dtype=np.intp)
+    scores[exclude] = -np.inf
+    if mask is not None:
+        scores[~mask] = -np.inf
+
+    top_n = min(top_n, np.count_nonzero(scores > -np.inf))
+    if top_n <= 0:
+        return np.empty(0, dtype=np.intp)
+
+    # Partition out the top_n scores, then also take every entry tied with the lowest one
+    # so that ties at the cut-off are resolved by index rather than by partition order
+    part = np.argpartition(-scores, top_n - 1)[:top_n]
+    candidates = np.flatnonzero(scores >= scores[part].min())
+
+    # Sort the small candidate set by score (descending), then by index
+    order = np.lexsort((candidates, -scores[candidates]))
+    return candidates[order[:top_n]]
+
+
+# Best top_n (index, score) pairs for an item, excluding the item itself
+# (and every item outside the boolean mask, when one is given):
+def top_neighbours(neighbours, matrix, idx, top_n, mask=None):
+    if top_n < 1:
+        raise ValueError(f"top_n must be at least 1, got {top_n}.")
+
+    # The neighbour table already holds the sorted best K entries of the row. Filtering keeps that order,
+    # so the table answers a filtered request too whenever at least top_n of its entries pass the mask
+    if top_n <= neighbours.shape[1]:
+        row = neighbours[idx]
+        row = row[row['index'] >= 0]
+        if mask is not None:
+            row = row[mask[row['index']]]
+        if len(row) >= top_n:
+            row = row[:top_n]
+            return list(zip(row['index'].tolist(), neighbour_scores(row).tolist()))
+
+    # Otherwise fall back to selecting from the full similarity row
+    sim_scores = similarity_row(matrix, idx)
+    return [(int(i), float(sim_scores[i])) for i in top_n_indices(sim_scores, top_n, exclude=[idx], mask=mask)]
+
+
+# Row-wise top_n_indices for a 2-D block of scores, excluding column exclude[r] from row r (-1 excludes nothing).
+# Returns (indices, scores) of shape (rows, top_n), ordered by score (descending) then by index
+def top_n_rows(scores, top_n, exclude=None, copy=True):
+    # Without copy the excluded entries are overwritten in place (for scratch blocks)
+    scores = np.array(scores, dtype=np.float64) if copy else np.asarray(scores, dtype=np.float64)
+    n_rows, n_cols = scores.shape
+    rows = np.arange(n_rows)
+    if exclude is not None:
+        exclude = np.asarray(exclude, dtype=np.intp)
+        excluded = exclude >= 0
+        scores[rows[excluded], exclude[excluded]] = -np.inf
+
+    top_n = min(top_n, n_cols - (1 if exclude is not None else 0))
+    if top_n <= 0:
+        return np.empty((n_rows, 0), dtype=np.intp), np.empty((n_rows, 0), dtype=np.float64)
+
+    # Partition out the top_n scores of every row and sort them by (score desc, index asc)
+    top = np.argpartition(-scores, top_n - 1, axis=1)[:, :top_n]
+    top_scores = np.take_along_axis(scores, top, axis=1)
+    order = np.lexsort((top, -top_scores))
+    top = np.take_along_axis(top, order, axis=1)
+    top_scores = np.take_along_axis(top_scores, order, axis=1)
+
+    # Rows with more entries tied at the cut-off than fit are redone one by one, so ties resolve by index
+    tied = np.flatnonzero((scores >= top_scores[:, -1:]).sum(axis=1) > top_n)
+    for r in tied:
+        top[r] = top_n_indices(scores[r], top_n)
+        top_scores[r] = scores[r, top[r]]
+    return top, top_scores
+
+
+# Top-K neighbour table (int32 index + score per entry, sorted by score then index) of the rows from start on.
+# Scores are stored as score_dtype, float16 or float32 (the full-precision table the other storage dtypes are
+# quantised from, see quantise.py). Catalogues with K items or fewer leave the last entries of every row empty (PADDING_INDEX, score 0).
+# Rows are scored in blocks of block_size x N dense scores. By default the blocks are sized so that the blocks of all
+# workers together stay within BLOCK_MEMORY, temporaries included, so peak memory does not grow with N x N.
+# Blocks run on a thread pool (the sparse product, toarray and argpartition release the GIL) and are written straight
+# into out, e.g. a memory-mapped .npy file
+def build_neighbour_table(matrix, k=NEIGHBOURS_K, start=0, block_size=None, workers=None, out=None, score_dtype='float16'):
+    n_items = matrix.shape[0]
+    workers = workers or os.cpu_count()
+    if block_size is None:
+        block_size = max(1, BLOCK_MEMORY // (BLOCK_BYTES_PER_SCORE * n_items * workers))
+    neighbours = np.empty((n_items - start, k), dtype=neighbours_dtype(score_dtype)) if out is None else out
+
+    # Transposed once, instead of converting matrix.T to CSR in every block product
+    transposed = matrix.T.tocsr()
+
+    def fill_block(block_start):
+        rows = np.arange(block_start, min(block_start + block_size, n_items))
+        top, top_scores = top_n_rows((matrix[rows] @ transposed).toarray(), k, exclude=rows, copy=False)
+        neighbours['index'][rows - start, :top.shape[1]] = top
+        neighbours['score'][rows - start, :top.shape[1]] = top_scores
+        neighbours['index'][rows - start, top.shape[1]:] = PADDING_INDEX
+        neighbours['score'][rows - start, top.shape[1]:] = 0
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        # list() re-raises the first error of a block
+        list(executor.map(fill_block, range(start, n_items, block_size)))
+    return neighbours
+
+
+# Neighbour table of the whole matrix written block by block to a memory-mapped .npy file, returned read-only.
+# The file is moved into place once complete, so readers never see a partial table
+def build_neighbour_file(matrix, file_path, k=NEIGHBOURS_K, block_size=None, workers=None, score_dtype='float16'):
+    tmp_path = f"{file_path}.tmp"
+    out = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=neighbours_dtype(score_dtype), shape=(matrix.shape[0], k))
+    build_neighbour_table(matrix, k, block_size=block_size, workers=workers, out=out)
+    out.flush()
+    del out
+    os.replace(tmp_path, file_path)
+    return np.load(file_path, mmap_mode='r')
@@ -0,0 +1,73 @@
+import numpy as np
+
+from .columns import parse_list
+
+# The fields shown for a recommendation, as result name -> metadata column, or (column, formatter) for fields
+# derived from a column. Only the displayed rows of these columns are decoded from the column store.
+# List fields (cast, screenshots, stores) are stored and handed out as lists; the formatters still split joined
+# strings, for column stores written before the list columns of the notebooks' pickles were parsed
+
+
+def trailer_url(video_key):
+    return f"https://www.youtube.com/watch?v={video_key}" if video_key is not None else None
+
+
+# Image URLs of a list field, without placeholders such as 'Not Available':
+def url_list(urls):
+    return [url for url in parse_list(urls) if url.startswith('http')]
+
+
+# (store name, store URL) pairs of a game:
+def store_links(store_names, store_domains):
+    return [(name, f"https://{domain}") for name, domain in zip(parse_list(store_names), parse_list(store_domains))]
+
+
+MOVIE_RESULT_FIELDS = {
+    'Title': 'title',
+    'Top Cast': ('top_cast', parse_list),
+    'Cast Picture': ('cast_profile_path', parse_list),
+    'Description': 'description',
+    'Genre': 'genres',
+    'Language': 'languages',
+    'Release Date': 'release_date',
+    'Rating': 'rating',
+    'Poster': 'poster_path',
+    'Stream': 'watch_link',
+    'Trailer': ('video_key', trailer_url)
+}
+
+GAME_RESULT_FIELDS = {
+    'Title': 'title',
+    'Description': 'description_clean',
+    'Genre': 'genres',
+    'Release Date': 'release_date',
+    'Rating': 'rating',
+    'Platforms': 'platforms',
+    'Stores': (('store_name', 'store_domain'), store_links),
+    'Tags': 'tags',
+    'Developer': 'developers',
+    'Publisher': 'publishers',
+    'ESRB_Rating': 'esrb_rating',
+    'Poster': 'background_image_url',
+    'Website': 'website',
+    'Screenshots': ('screenshots', url_list)
+}
+
+
+# Values of one result field for the given rows (None for every row when the column is absent):
+def field_values(items, field, positions):
+    columns, formatter = field if isinstance(field, tuple) else (field, None)
+    columns = columns if isinstance(columns, tuple) else (columns,)
+    values = [items.take(column, positions) if column in items else np.full(len(positions), None, dtype=object)
+              for column in columns]
+    if formatter is None:
+        return values[0]
+    return [formatter(*row) for row in zip(*values)]
+
+
+# List of result records for the given row positions, one take per column of the column store:
+def materialise_results(items, result_fields, positions):
+    positions = np.asarray(positions, dtype=np.intp)
+    names = list(result_fields)
+    values = [field_values(items, result_fields[name], positions) for name in names]
+    return [dict(zip(names, row)) for row in zip(*values)]
@@ -0,0 +1,421 @@
+# Standalone JSON recommendation service, for other services that do not need the Streamlit UI:
+#
+#   python -m recommender.server --port 8000 --workers 4
+#
+#   GET  /movies/recommend?q=znmd&top_n=10        (or POST {"q": ..., "top_n": ..., "filters": {...}})
+#   GET  /games/recommend?q=elden+ring
+#   GET  /resolve?domain=movies&q=znmd            -> {"row": ..., "title": ..., "score": ...}
+#   POST /batch {"domain": "movies", "seeds": ["znmd", 42], "top_n": 10}
+#   GET  /metrics                                  (Prometheus text, see metrics.py)
+#   GET  /health
+#
+# asyncio HTTP/1.1 server with keep-alive (standard library only). The artifacts are loaded once at startup, and the
+# CPU-bound ranking runs on a bounded thread pool; when max_pending requests are already waiting for it, new ones
+# get 503 right away instead of queueing without bound.
+#
+# With --processes N the artifacts are loaded once in a parent that then forks N workers sharing one listening
+# socket (see serve_prefork). The matrices, neighbour tables and columns are memory-mapped and the title and filter
+# indexes are mostly NumPy arrays, so the workers share the parent's pages and memory stays roughly flat as N grows.
+# Every worker writes its metrics to a directory shared with the others (at least every METRICS_FLUSH_INTERVAL and
+# before answering a scrape), and /metrics reports the sum over all of them, whichever worker answers.
+
+import argparse
+import asyncio
+import gc
+import glob
+import json
+import math
+import os
+import shutil
+import signal
+import socket
+import sys
+import tempfile
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+
+from .artifacts import BASE_DIR
+from .engine import GameRecommender, MovieRecommender, TitleNotFound
+from .filters import validate_filters
+from .metrics import METRICS, combined_prometheus_text
+
+RECOMMENDERS = {'movies': MovieRecommender, 'games': GameRecommender}
+WORKERS = 4                     # Threads running the ranking
+MAX_PENDING = 256               # Requests waiting for or running on the pool before new ones get 503
+MAX_TOP_N = 100
+MAX_BATCH_SEEDS = 10000
+MAX_BODY_SIZE = 1 << 20
+MAX_HEADERS = 100
+MAX_LINE_SIZE = 8192            # Bytes of the request line and of every header line
+KEEP_ALIVE_TIMEOUT = 15         # Seconds an idle keep-alive connection stays open, and to send the rest of a request
+LISTEN_BACKLOG = 1024
+RESTART_DELAY = 1.0             # Seconds before a worker that died is replaced
+METRICS_FLUSH_INTERVAL = 1.0    # Seconds between two writes of a pre-forked worker's metrics
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+# JSON-serialisable copy of a value: NumPy scalars and arrays become Python values, NaN becomes null:
+def jsonable(value):
+    if isinstance(value, dict):
+        return {key: jsonable(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple, np.ndarray)):
+        return [jsonable(item) for item in value]
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    return value
+
+
+def response_bytes(status, body, content_type='application/json', keep_alive=True):
+    if content_type == 'application/json':
+        body = json.dumps(jsonable(body), ensure_ascii=False).encode('utf-8')
+    elif isinstance(body, str):
+        body = body.encode('utf-8')
+    status = HTTPStatus(status)
+    head = (f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+            f"Content-Type: {content_type}; charset=utf-8\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+    return head.encode('latin-1') + body
+
+
+# One line of the request head, or HTTPError(status) when it is longer than MAX_LINE_SIZE:
+async def read_line(reader, status, message):
+    try:
+        line = await reader.readuntil(b'\n')
+    except asyncio.IncompleteReadError as e:
+        line = e.partial
+    except asyncio.LimitOverrunError:
+        raise HTTPError(status, message)
+    if len(line) > MAX_LINE_SIZE:
+        raise HTTPError(status, message)
+    return line
+
+
+def int_param(params, name, default, maximum):
+    try:
+        value = int(params.get(name, default))
+    except (TypeError, ValueError):
+        raise HTTPError(400, f"{name} must be an integer")
+    if not 1 <= value <= maximum:
+        raise HTTPError(400, f"{name} must be between 1 and {maximum}")
+    return value
+
+
+# metrics_dir is the directory the workers of a pre-forked server share their metrics in (None for a single process)
+class RecommendationServer:
+    def __init__(self, recommenders, workers=WORKERS, max_pending=MAX_PENDING, metrics=METRICS, metrics_dir=None):
+        self.recommenders = recommenders
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='recommender')
+        self.max_pending = max_pending
+        self.pending = 0            # Only touched from the event loop thread
+        self.metrics = metrics
+        self.metrics_dir = metrics_dir
+
+    def recommender(self, domain):
+        if domain not in self.recommenders:
+            raise HTTPError(404, f"Unknown domain {domain!r}, expected one of: {', '.join(self.recommenders)}")
+        return self.recommenders[domain]
+
+    # Run fn on the worker pool, or fail with 503 when max_pending requests are already in flight:
+    async def run(self, fn, *args):
+        if self.pending >= self.max_pending:
+            raise HTTPError(503, "Too many requests in flight, retry later")
+        self.pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+        finally:
+            self.pending -= 1
+
+    # ----------------------------- Routes (run on the worker pool)
+
+    def recommend(self, domain, params):
+        recommender = self.recommender(domain)
+        query = params.get('q') or params.get('query')
+        if not isinstance(query, str) or not query.strip():
+            raise HTTPError(400, "q (the title to get recommendations for) is required")
+        top_n = int_param(params, 'top_n', 10, MAX_TOP_N)
+        filters = params.get('filters')
+        if filters is not None and not isinstance(filters, dict):
+            raise HTTPError(400, "filters must be a JSON object, e.g. {\"language\": \"Hindi\"}")
+        try:
+            validate_filters(recommender.filter_index, filters)
+            results = recommender.recommend_title(query, top_n, filters)
+        except TitleNotFound as e:
+            raise HTTPError(404, str(e))
+        except ValueError as e:
+            raise HTTPError(400, str(e))
+        return {'query': query, 'results': results}
+
+    def resolve(self, params):
+        recommender = self.recommender(params.get('domain', 'movies'))
+        query = params.get('q') or params.get('query')
+        if not isinstance(query, str) or not query.strip():
+            raise HTTPError(400, "q (the title to resolve) is required")
+        match_result = recommender.resolve_title(query)
+        if match_result is None:
+            raise HTTPError(404, f"No title matches {query!r}")
+        row, title, score = match_result
+        return {'query': query, 'row': row, 'title': title, 'score': score}
+
+    def batch(self, params):
+        recommender = self.recommender(params.get('domain', 'movies'))
+        seeds = params.get('seeds')
+        if not isinstance(seeds, list) or not all(isinstance(seed, (str, int)) and not isinstance(seed, bool)
+                                                  for seed in seeds):
+            raise HTTPError(400, "seeds must be a list of titles and / or row ids")
+        if len(seeds) > MAX_BATCH_SEEDS:
+            raise HTTPError(400, f"At most {MAX_BATCH_SEEDS} seeds per batch")
+        batch = recommender.recommend_batch(seeds, int_param(params, 'top_n', 10, MAX_TOP_N))
+        return {'seeds': batch.seeds, 'indices': batch.indices, 'scores': batch.scores}
+
+    # ----------------------------- Metrics
+
+    def metrics_file(self):
+        return os.path.join(self.metrics_dir, f"worker-{os.getpid()}.json")
+
+    def metrics_text(self):
+        if self.metrics_dir is None:
+            return self.metrics.prometheus_text()
+        self.metrics.write_state(self.metrics_file())
+        return combined_prometheus_text(sorted(glob.glob(os.path.join(self.metrics_dir, 'worker-*.json'))))
+
+    async def flush_metrics(self):
+        while True:
+            self.metrics.write_state(self.metrics_file())
+            await asyncio.sleep(METRICS_FLUSH_INTERVAL)
+
+    # ----------------------------- HTTP
+
+    async def dispatch(self, method, target, body):
+        url = urlsplit(target)
+        params = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        if method == 'POST':
+            try:
+                payload = json.loads(body or b'{}')
+            except ValueError:
+                raise HTTPError(400, "The request body must be JSON")
+            if not isinstance(payload, dict):
+                raise HTTPError(400, "The request body must be a JSON object")
+            params.update(payload)
+        elif method != 'GET':
+            raise HTTPError(405, f"Method {method} is not allowed")
+
+        path = url.path.rstrip('/') or '/'
+        if path == '/health':
+            return 200, {'status': 'ok', 'domains': list(self.recommenders)}, 'application/json'
+        if path == '/metrics':
+            return 200, self.metrics_text(), 'text/plain; version=0.0.4'
+        if path == '/resolve':
+            return 200, await self.run(self.resolve, params), 'application/json'
+        if path == '/batch':
+            if method != 'POST':
+                raise HTTPError(405, "Use POST for /batch")
+            return 200, await self.run(self.batch, params), 'application/json'
+        parts = path.strip('/').split('/')
+        if len(parts) == 2 and parts[1] == 'recommend':
+            return 200, await self.run(self.recommend, parts[0], params), 'application/json'
+        raise HTTPError(404, f"No route for {path}")
+
+    # Read one request from the connection, returns (method, target, version, headers, body) or None at EOF.
+    # The request line may take KEEP_ALIVE_TIMEOUT to arrive, and the headers and body another KEEP_ALIVE_TIMEOUT
+    # together, so a slow client cannot hold the connection open line by line
+    async def read_request(self, reader):
+        request_line = await asyncio.wait_for(read_line(reader, 414, "Request line too long"), KEEP_ALIVE_TIMEOUT)
+        if not request_line.strip():
+            return None
+        try:
+            method, target, version = request_line.decode('latin-1').split()
+        except ValueError:
+            raise HTTPError(400, "Malformed request line")
+
+        headers, body = await asyncio.wait_for(self.read_headers_and_body(reader), KEEP_ALIVE_TIMEOUT)
+        return method.upper(), target, version, headers, body
+
+    async def read_headers_and_body(self, reader):
+        headers = {}
+        for _ in range(MAX_HEADERS + 1):
+            line = await read_line(reader, 431, "Header line too long")
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        else:
+            raise HTTPError(431, "Too many headers")
+
+        try:
+            length = int(headers.get('content-length', 0))
+        except ValueError:
+            raise HTTPError(400, "Malformed Content-Length")
+        if length < 0:
+            raise HTTPError(400, "Malformed Content-Length")
+        if length > MAX_BODY_SIZE:
+            raise HTTPError(413, "Request body too large")
+        body = await reader.readexactly(length) if length else b''
+        return headers, body
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request = await self.read_request(reader)
+                except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+                    break
+                except HTTPError as e:
+                    writer.write(response_bytes(e.status, {'error': str(e)}, keep_alive=False))
+                    await writer.drain()
+                    break
+                if request is None:
+                    break
+
+                method, target, version, headers, body = request
+                connection = headers.get('connection', '').lower()
+                keep_alive = connection == 'keep-alive' if version == 'HTTP/1.0' else connection != 'close'
+                try:
+                    status, payload, content_type = await self.dispatch(method, target, body)
+                except HTTPError as e:
+                    status, payload, content_type = e.status, {'error': str(e)}, 'application/json'
+                except Exception as e:
+                    status, payload, content_type = 500, {'error': f"Unexpected error: {e}"}, 'application/json'
+
+                writer.write(response_bytes(status, payload, content_type, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    # Serve on host:port, or on an already bound listening socket (sock):
+    async def serve(self, host='127.0.0.1', port=8000, sock=None):
+        if sock is not None:
+            server = await asyncio.start_server(self.handle_connection, sock=sock)
+        else:
+            server = await asyncio.start_server(self.handle_connection, host, port)
+        flusher = asyncio.create_task(self.flush_metrics()) if self.metrics_dir is not None else None
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            if flusher is not None:
+                flusher.cancel()
+
+
+# Recommenders of the given domains with their artifacts loaded:
+def load_recommenders(domains, base_dir=BASE_DIR, use_ann=False):
+    return {domain: RECOMMENDERS[domain](base_dir, use_ann=use_ann).load() for domain in domains}
+
+
+# Run one worker on an inherited listening socket (in a forked child):
+def run_worker(recommenders, sock, workers=WORKERS, max_pending=MAX_PENDING, metrics=METRICS, metrics_dir=None):
+    # The profiler thread of the parent does not survive the fork
+    if metrics.profiler is not None:
+        interval = metrics.profiler.interval
+        metrics.profiler = None
+        metrics.enable_profiler(interval)
+    server = RecommendationServer(recommenders, workers, max_pending, metrics, metrics_dir)
+    asyncio.run(server.serve(sock=sock))
+
+
+# Pre-fork serving: bind host:port, fork processes workers that serve the already loaded recommenders, and replace
+# workers that die until the parent gets SIGINT / SIGTERM. The workers share their metrics in a temporary directory
+# that is removed on shutdown.
+# gc.freeze() moves everything loaded so far out of the garbage collector's reach, so collections in the workers
+# do not write to (and thereby copy) the pages they share with the parent. Threads must not be started before
+# the fork; each worker creates its own thread pool
+def serve_prefork(recommenders, processes, host='127.0.0.1', port=8000, workers=WORKERS, max_pending=MAX_PENDING):
+    sock = socket.create_server((host, port), backlog=LISTEN_BACKLOG)
+    metrics_dir = tempfile.mkdtemp(prefix='recommender-metrics-')
+    gc.collect()
+    gc.freeze()
+
+    children = set()
+    stopping = False
+
+    def spawn():
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGINT, signal.SIG_IGN)      # Shut down by the parent with SIGTERM
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            code = 0
+            try:
+                run_worker(recommenders, sock, workers, max_pending, metrics_dir=metrics_dir)
+            except BaseException:
+                traceback.print_exc()
+                code = 1
+            finally:
+                sys.stderr.flush()
+                os._exit(code)
+        children.add(pid)
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+    for _ in range(processes):
+        spawn()
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        children.discard(pid)
+        if not stopping:
+            print(f"Worker {pid} exited with status {os.waitstatus_to_exitcode(status)}, starting a new one")
+            time.sleep(RESTART_DELAY)
+            if not stopping:
+                spawn()
+    sock.close()
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve recommendations as JSON over HTTP.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--base-dir', default=BASE_DIR)
+    parser.add_argument('--domains', nargs='+', choices=list(RECOMMENDERS), default=list(RECOMMENDERS))
+    parser.add_argument('--use-ann', action='store_true', help="Serve from the approximate <domain>_ann indexes")
+    parser.add_argument('--workers', type=int, default=WORKERS, help="Threads running the ranking")
+    parser.add_argument('--max-pending', type=int, default=MAX_PENDING,
+                        help="Requests in flight before new ones are rejected with 503 (per process)")
+    parser.add_argument('--processes', type=int, default=1,
+                        help="Worker processes forked after loading the artifacts once (Unix only)")
+    args = parser.parse_args(argv)
+
+    recommenders = load_recommenders(args.domains, args.base_dir, args.use_ann)
+    print(f"Serving {', '.join(args.domains)} on http://{args.host}:{args.port}"
+          + (f" with {args.processes} processes" if args.processes > 1 else ''), flush=True)
+    if args.processes > 1:
+        serve_prefork(recommenders, args.processes, args.host, args.port, args.workers, args.max_pending)
+        return
+
+    server = RecommendationServer(recommenders, args.workers, args.max_pending)
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,201 @@
+import re
+import unicodedata
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+from rapidfuzz import process, fuzz
+
+
+# Same cleaning as the title_clean column built in the recommendation notebooks:
+def clean_title(title):
+    title = unicodedata.normalize('NFKD', title).encode('ascii', 'ignore').decode('utf-8', 'ignore')
+    title = title.lower().strip()
+    title = re.sub(r'[^a-z0-9\s]','',title)
+    title = re.sub(r'\s+',' ', title)
+    return title
+
+
+# Fuzzy search settings:
+TRIGRAM_CANDIDATES = 300        # Titles passed on to the fuzzy scorer after the trigram prefilter
+MIN_PREFILTER_SCORE = 60        # Below this best score the full catalogue is scored instead
+MIN_PREFILTER_LENGTH = 6        # Shorter queries share too few trigrams to rank candidates, so they skip the prefilter
+
+# Characters counted separately for the score bound, every other character shares the last bin
+CHAR_BINS = np.full(128, 37, dtype=np.intp)
+CHAR_BINS[[ord(char) for char in 'abcdefghijklmnopqrstuvwxyz0123456789 ']] = np.arange(37)
+N_CHAR_BINS = 38
+
+
+# Character trigrams of a title, padded so that short titles and word starts get trigrams too:
+def title_trigrams(title):
+    padded = f"  {title} "
+    return {padded[i:i+3] for i in range(len(padded) - 2)}
+
+
+# (lengths, character counts per bin) of a list of titles, counts capped at 255 to fit uint8:
+def char_counts(titles):
+    lengths = np.array([len(title) for title in titles], dtype=np.int64)
+    # Code points of all titles at once (UTF-32 has one unit per character)
+    codes = np.minimum(np.frombuffer(''.join(titles).encode('utf-32-le'), dtype=np.uint32), 127).astype(np.intp)
+    rows = np.repeat(np.arange(len(titles)), lengths)
+    counts = np.bincount(rows * N_CHAR_BINS + CHAR_BINS[codes], minlength=len(titles) * N_CHAR_BINS)
+    return lengths.astype(np.int32), np.minimum(counts, 255).astype(np.uint8).reshape(len(titles), N_CHAR_BINS)
+
+
+# Build the title lookup index once per catalogue:
+#   choices  - titles (plus "title year" keys for duplicated titles) scored by the fuzzy matcher
+#   rows     - row id of every entry in choices
+#   exact    - clean title -> row id (first occurrence, as the boolean-mask search picked before)
+#   aliases  - cleaned alias -> cleaned target title
+#   trigrams - trigram -> positions in choices containing it (inverted index for the prefilter)
+#   lengths, char_counts - length and character counts of every entry in choices (score bound, see match_title)
+def build_title_index(titles, release_dates, aliases):
+    titles = [title if isinstance(title, str) else '' for title in titles]
+    years = pd.Series(release_dates).astype(str).str.extract(r'(\d{4})')[0].to_list()
+    title_counts = Counter(titles)
+
+    choices, rows, exact = [], [], {}
+    for row, (title, year) in enumerate(zip(titles, years)):
+        choices.append(title)
+        rows.append(row)
+        if title:
+            exact.setdefault(title, row)
+
+        # Duplicated titles can be picked explicitly by adding the release year, e.g. "dune 1984"
+        if title and title_counts[title] > 1 and isinstance(year, str):
+            key = f"{title} {year}"
+            if key not in exact:
+                exact[key] = row
+                choices.append(key)
+                rows.append(row)
+
+    trigrams = {}
+    for position, choice in enumerate(choices):
+        for trigram in title_trigrams(choice):
+            trigrams.setdefault(trigram, []).append(position)
+
+    return {
+        'choices': choices,
+        'rows': np.array(rows, dtype=np.int64),
+        'exact': exact,
+        'aliases': {clean_title(alias): clean_title(target) for alias, target in aliases.items()},
+        'trigrams': {trigram: np.array(positions, dtype=np.int32) for trigram, positions in trigrams.items()},
+        **dict(zip(['lengths', 'char_counts'], char_counts(choices)))
+    }
+
+
+# Append the titles from row start_row on to an existing title index (titles / release_dates are the full columns):
+def extend_title_index(title_index, titles, release_dates, start_row):
+    titles = [title if isinstance(title, str) else '' for title in titles]
+    years = pd.Series(release_dates).astype(str).str.extract(r'(\d{4})')[0].to_list()
+    choices, rows, exact = list(title_index['choices']), list(title_index['rows']), dict(title_index['exact'])
+    trigrams = {}
+
+    def add_choice(choice, row):
+        for trigram in title_trigrams(choice):
+            trigrams.setdefault(trigram, []).append(len(choices))
+        choices.append(choice)
+        rows.append(row)
+
+    for row in range(start_row, len(titles)):
+        title = titles[row]
+        first_row = exact.get(title) if title else None
+        add_choice(title, row)
+        if first_row is None:
+            if title:
+                exact[title] = row
+            continue
+
+        # The title is now duplicated, so both copies get a "title year" key
+        for duplicate_row in [first_row, row]:
+            year = years[duplicate_row]
+            key = f"{title} {year}"
+            if isinstance(year, str) and key not in exact:
+                exact[key] = duplicate_row
+                add_choice(key, duplicate_row)
+
+    new_lengths, new_counts = char_counts(choices[len(title_index['choices']):])
+    merged_trigrams = dict(title_index['trigrams'])
+    for trigram, positions in trigrams.items():
+        positions = np.array(positions, dtype=np.int32)
+        merged_trigrams[trigram] = np.concatenate([merged_trigrams[trigram], positions]) if trigram in merged_trigrams else positions
+
+    return {
+        'choices': choices,
+        'rows': np.array(rows, dtype=np.int64),
+        'exact': exact,
+        'aliases': title_index['aliases'],
+        'trigrams': merged_trigrams,
+        'lengths': np.concatenate([title_index['lengths'], new_lengths]),
+        'char_counts': np.concatenate([title_index['char_counts'], new_counts])
+    }
+
+
+# Positions in choices sharing the most trigrams with the query, in ascending order:
+def trigram_candidates(title_index, query, limit=TRIGRAM_CANDIDATES):
+    postings = [title_index['trigrams'][trigram] for trigram in title_trigrams(query) if trigram in title_index['trigrams']]
+    if not postings:
+        return np.empty(0, dtype=np.int64)
+
+    # Count shared trigrams per title and keep the best `limit` titles
+    counts = np.bincount(np.concatenate(postings), minlength=len(title_index['choices']))
+    candidates = np.flatnonzero(counts)
+    if len(candidates) > limit:
+        candidates = np.sort(candidates[np.argpartition(-counts[candidates], limit - 1)[:limit]])
+    return candidates
+
+
+# Positions in choices whose fuzz.ratio with the query can reach min_score, in ascending order.
+# fuzz.ratio is 200 * LCS / (len(query) + len(title)), and the longest common subsequence is at most the
+# shorter length and at most the characters the two have in common (per character bin), so every title
+# outside the result scores below min_score. Returns None when the bound cannot be used
+def bounded_candidates(title_index, query, min_score):
+    query_length, query_counts = char_counts([query])
+    if query_counts.max() == 255:
+        # Capped counts would understate the common characters
+        return None
+
+    # Bound on the lengths first, then on the common characters of the titles left
+    lengths = title_index['lengths']
+    threshold = min_score - 1e-6
+    rows = np.flatnonzero(200.0 * np.minimum(lengths, query_length[0]) >= threshold * (lengths + query_length[0]))
+    common = np.minimum(title_index['char_counts'][rows], query_counts[0]).sum(axis=1, dtype=np.int64)
+    return rows[200.0 * common >= threshold * (lengths[rows] + query_length[0])]
+
+
+# Best fuzz.ratio match of the query among the given positions in choices, as (title, score, position):
+def extract_best(title_index, query, positions):
+    choices = title_index['choices']
+    match_result = process.extractOne(query, [choices[position] for position in positions], scorer=fuzz.ratio)
+    if match_result is None:
+        return None
+    best_match, score, position = match_result
+    return best_match, score, positions[position]
+
+
+# Match a cleaned (and alias-resolved) query to (row id, matched title, score), or None if nothing matches.
+# Returns the same match as process.extractOne over all titles (ties go to the first title in catalogue order)
+def match_title(title_index, query):
+    # Exact and alias hits cost a single hash lookup
+    row = title_index['exact'].get(query)
+    if row is not None:
+        return row, query, 100.0
+
+    # Otherwise fuzzy match, first against the titles picked by the trigram prefilter
+    candidates = trigram_candidates(title_index, query) if len(query) >= MIN_PREFILTER_LENGTH else []
+    match_result = extract_best(title_index, query, candidates) if len(candidates) else None
+
+    # The prefilter's best score bounds the search: only titles that could reach it are scored, in catalogue order,
+    # so the result is the full scan's. Without a convincing prefilter match the whole catalogue is scored
+    positions = None
+    if match_result is not None and match_result[1] >= MIN_PREFILTER_SCORE:
+        positions = bounded_candidates(title_index, query, match_result[1])
+    if positions is None:
+        match_result = process.extractOne(query, title_index['choices'], scorer=fuzz.ratio)
+    else:
+        match_result = extract_best(title_index, query, positions)
+    if match_result is None:
+        return None
+    best_match, score, position = match_result
+    return int(title_index['rows'][position]), best_match, score
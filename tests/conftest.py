@@ -0,0 +1,52 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+from scipy import sparse
+
+# The tests import the recommender package from the repository root, as Deployment/app.py does
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+
+# L2-normalised sparse matrix like the TF-IDF artifacts, with small integer weights so that many scores tie:
+def tfidf_like(n_items, n_terms=300, density=0.02, seed=0):
+    rng = np.random.default_rng(seed)
+    matrix = sparse.random(n_items, n_terms, density=density, random_state=seed, format='csr')
+    matrix.data[:] = rng.integers(1, 3, len(matrix.data))
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1))).ravel()
+    norms[norms == 0] = 1
+    return sparse.diags(1 / norms) @ matrix
+
+
+@pytest.fixture
+def matrix():
+    return tfidf_like(600).tocsr()
+
+
+# Movie catalogue as the recommendation notebooks pickle it (movies_recommended.pkl only, no built artifacts):
+def write_movie_pickle(base_dir, n_items=300, seed=0):
+    rng = np.random.default_rng(seed)
+    words = [f"w{i}" for i in range(200)]
+    titles = [f"{' '.join(rng.choice(['dark', 'knight', 'star', 'war', 'love', 'city', 'ring'], 2))} {i}"
+              for i in range(n_items)]
+    titles[:3] = ['Zindagi Na Milegi Dobara', 'Dune', 'Dune']
+    soups = [' '.join(rng.choice(words, 20)) for _ in range(n_items)]
+    movies = pd.DataFrame({
+        'title': titles,
+        'title_clean': [title.lower() for title in titles],
+        'top_cast': ['A One, B Two'] * n_items,
+        'cast_profile_path': ['/a.jpg, /b.jpg'] * n_items,
+        'description': soups,
+        'genres': [', '.join(rng.choice(['Action', 'Drama', 'Comedy', 'Romance'], 2, replace=False)) for _ in range(n_items)],
+        'languages': rng.choice(['English', 'Hindi', 'French'], n_items),
+        'release_date': [f"{year}-01-01" for year in rng.integers(1980, 2024, n_items)],
+        'rating': rng.uniform(1, 9, n_items).round(1),
+        'poster_path': ['/p.jpg'] * n_items,
+        'watch_link': ['http://w'] * n_items,
+        'video_key': [None if i % 3 else 'abc' for i in range(n_items)],
+        'final_soup': soups,
+    })
+    movies.to_pickle(os.path.join(base_dir, 'movies_recommended.pkl'))
+    return movies
@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+
+from conftest import tfidf_like
+from recommender.ann import ann_neighbours, build_ann_index
+from recommender.ranking import similarity_row
+
+
+@pytest.fixture(scope='module')
+def index_and_matrix():
+    matrix = tfidf_like(2000, n_terms=400).tocsr()
+    return build_ann_index(matrix, n_components=32, n_lists=40), matrix
+
+
+# A filter matching few items still gets a full page (or every matching item) even with a single probed list:
+@pytest.mark.parametrize('share', [0.02, 0.1])
+def test_filtered_ann_returns_a_full_page(index_and_matrix, share):
+    index, matrix = index_and_matrix
+    rng = np.random.default_rng(0)
+    mask = rng.random(matrix.shape[0]) < share
+    for idx in rng.choice(matrix.shape[0], 50, replace=False):
+        results = ann_neighbours(index, matrix, idx, 10, mask=mask, nprobe=1)
+        assert len(results) == min(10, np.count_nonzero(mask) - mask[idx])
+        assert all(mask[i] and i != idx for i, _ in results)
+
+
+def test_ann_scores_are_exact(index_and_matrix):
+    index, matrix = index_and_matrix
+    results = ann_neighbours(index, matrix, 5, 10)
+    sim_scores = similarity_row(matrix, 5)
+    assert [score for _, score in results] == pytest.approx([sim_scores[i] for i, _ in results])
+    assert len(results) == 10
+    with pytest.raises(ValueError):
+        ann_neighbours(index, matrix, 5, 0)
+
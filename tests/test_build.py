@@ -0,0 +1,24 @@
+import inspect
+
+from recommender import build
+from recommender.build import stage_key, stage_modules
+from recommender.preprocess import add_clean_titles, load_games, load_movies
+from recommender.ranking import build_neighbour_file
+
+
+def test_stages_depend_on_the_package_modules_they_use():
+    assert {'recommender.preprocess', 'recommender.titles'} <= set(stage_modules(add_clean_titles))
+    for load in [load_movies, load_games]:
+        assert {'recommender.preprocess', 'recommender.columns'} <= set(stage_modules(load))
+    assert set(stage_modules(build_neighbour_file)) == {'recommender.ranking'}
+
+
+# An edit to a module a stage only imports from (titles.clean_title) invalidates the cached output:
+def test_stage_key_changes_with_a_dependency(monkeypatch):
+    key = stage_key('clean_titles', add_clean_titles, {'drop_empty': False}, 'input')
+    index_key = stage_key('index', build_neighbour_file, {'k': 50}, 'input')
+    get_source = inspect.getsource
+    monkeypatch.setattr(build.inspect, 'getsource',
+                        lambda module: get_source(module) + ('# edited' if module.__name__ == 'recommender.titles' else ''))
+    assert stage_key('clean_titles', add_clean_titles, {'drop_empty': False}, 'input') != key
+    assert stage_key('index', build_neighbour_file, {'k': 50}, 'input') == index_key
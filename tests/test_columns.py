@@ -0,0 +1,31 @@
+import numpy as np
+import pandas as pd
+
+from recommender.columns import ColumnStore, save_columns
+
+
+def test_column_store_round_trip(tmp_path):
+    items = pd.DataFrame({
+        'id': [3, 1, 2],
+        'rating': [7.5, np.nan, 6.0],
+        'title': ['Dil Chahta Hai', None, 'Amélie'],
+        'release_date': pd.to_datetime(['2001-08-10', '1999-01-01', '2001-04-25']),
+        'cast': [['A One', 'B Two'], [], ['Audrey Tautou']],
+        # Stringified lists (as in the pickles) are parsed once the column holds real lists
+        'genres': [['Drama', 'Comedy'], None, "['Romance']"],
+    })
+    save_columns(tmp_path / 'columns', items)
+    store = ColumnStore(tmp_path / 'columns')
+
+    assert len(store) == 3 and store.columns == list(items.columns)
+    assert store['id'].tolist() == [3, 1, 2]
+    np.testing.assert_array_equal(store['rating'], items['rating'])
+    assert store['title'].tolist() == ['Dil Chahta Hai', None, 'Amélie']
+    assert store['release_date'].tolist() == ['2001-08-10', '1999-01-01', '2001-04-25']
+    assert store['cast'].tolist() == [['A One', 'B Two'], [], ['Audrey Tautou']]
+    assert store['genres'].tolist() == [['Drama', 'Comedy'], [], ['Romance']]
+
+    assert store.take('cast', [2, 0]).tolist() == [['Audrey Tautou'], ['A One', 'B Two']]
+    assert store.take('title', [1, 2]).tolist() == [None, 'Amélie']
+    assert store.take('rating', [2]).tolist() == [6.0]
+    pd.testing.assert_frame_equal(store.to_frame(), pd.DataFrame({name: store[name] for name in items.columns}))
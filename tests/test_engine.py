@@ -0,0 +1,94 @@
+import os
+
+import numpy as np
+import pytest
+
+from conftest import write_movie_pickle
+from recommender.ann import build_ann_index, save_ann_index
+from recommender.engine import MovieRecommender, TitleNotFound
+
+
+@pytest.fixture
+def catalogue(tmp_path):
+    write_movie_pickle(str(tmp_path))
+    return str(tmp_path)
+
+
+# Catalogue served from an ANN index, built the way build_ann does from the TF-IDF matrix:
+@pytest.fixture
+def ann_catalogue(catalogue):
+    recommender = MovieRecommender(catalogue, use_ann=True)
+    recommender.items = recommender.load_items()
+    matrix, _ = recommender.load_similarity()
+    save_ann_index(os.path.join(catalogue, 'movies_ann'), build_ann_index(matrix, n_components=16))
+    return catalogue
+
+
+def test_pickle_only_catalogue_builds_its_artifacts(catalogue):
+    movies = MovieRecommender(catalogue).load()
+    assert os.path.exists(os.path.join(catalogue, 'movies_neighbours.npy'))
+    results = movies.recommend('zindagi na milgi dobara', top_n=5)
+    assert len(results) == 5 and all(result['Title'] != 'Zindagi Na Milegi Dobara' for result in results)
+
+
+def test_joined_list_columns_of_the_pickle_are_stored_as_lists(catalogue):
+    movies = MovieRecommender(catalogue).load()
+    assert movies.items.kinds['top_cast'] == movies.items.kinds['cast_profile_path'] == 'list'
+    result = movies.recommend('dune', top_n=1)[0]
+    assert result['Top Cast'] == ['A One', 'B Two'] and result['Cast Picture'] == ['/a.jpg', '/b.jpg']
+
+
+def test_ann_mode_does_not_build_or_load_the_neighbour_table(ann_catalogue):
+    movies = MovieRecommender(ann_catalogue, use_ann=True).load()
+    assert movies.neighbours is None
+    assert not os.path.exists(os.path.join(ann_catalogue, 'movies_neighbours.npy'))
+
+    assert len(movies.recommend('dune 1', top_n=5)) == 5
+    batch = movies.recommend_batch(['zindagi na milegi dobara', 7, '!!!'], top_n=60)
+    assert batch.seeds[2] == -1 and np.all(batch.indices[2] == -1)
+    for position in [0, 1]:
+        expected = [i for i, _ in movies.item_neighbours(int(batch.seeds[position]), 60)]
+        assert batch.indices[position].tolist() == expected
+
+
+def test_titles_ingested_after_the_ann_index_are_scored_exactly(ann_catalogue):
+    movies = MovieRecommender(ann_catalogue, use_ann=True).load()
+    n_indexed = len(movies.items)
+    movies.ingest(movies.items.to_frame().iloc[:2].assign(title='Brand New Film', title_clean='brand new film'))
+    assert movies.neighbours is None and len(movies.items) == n_indexed + 2
+
+    sim_scores = (movies.matrix @ movies.matrix[n_indexed].T).toarray().ravel()
+    sim_scores[n_indexed] = -np.inf
+    expected = np.argsort(-sim_scores, kind='stable')[:5]
+    assert [i for i, _ in movies.item_neighbours(n_indexed, 5)] == expected.tolist()
+
+
+def test_recommend_title_raises_and_recommend_returns_the_error(catalogue):
+    movies = MovieRecommender(catalogue).load()
+    with pytest.raises(TitleNotFound):
+        movies.recommend_title('!!!')
+    with pytest.raises(ValueError, match="Unknown filter 'mood'"):
+        movies.recommend_title('dune', filters={'mood': 'happy'})
+    assert 'is not updated in the data' in movies.recommend('!!!')['Error']
+    assert movies.recommend('   ')['Error'].startswith('User input must not be empty')
+
+
+def test_filters_are_validated_before_the_cache_key_is_built(catalogue):
+    movies = MovieRecommender(catalogue).load()
+    assert movies.recommend('dune', filters={'genre': {'name': 'Drama'}}) == {
+        'Error': "Filter 'genre' takes a string or a list of strings."}
+
+    # The same values in any order share one cache entry
+    first = movies.recommend('dune', top_n=5, filters={'genre': {'Drama', 'Action', 'Comedy'}})
+    hits = movies.cache.hits
+    assert movies.recommend('dune', top_n=5, filters={'genre': ['Comedy', 'Drama', 'Action']}) == first
+    assert movies.cache.hits == hits + 1
+
+
+@pytest.mark.parametrize('top_n', [0, -1])
+def test_top_n_below_one_is_rejected(catalogue, top_n):
+    movies = MovieRecommender(catalogue).load()
+    with pytest.raises(ValueError, match='top_n must be at least 1'):
+        movies.recommend_batch(['dune', 3], top_n=top_n)
+    assert movies.recommend_profile(['dune'], top_n=top_n) == {'Error': f"top_n must be at least 1, got {top_n}."}
+    assert movies.recommend('dune', top_n=top_n) == {'Error': f"top_n must be at least 1, got {top_n}."}
@@ -0,0 +1,22 @@
+import numpy as np
+import pytest
+
+from conftest import tfidf_like
+from recommender.incremental import merge_neighbours
+from recommender.quantise import SCORE_DTYPES, quantise_neighbours
+from recommender.ranking import build_neighbour_table
+
+
+# Merging new rows into the lists of the existing ones gives the lists a full rebuild writes:
+@pytest.mark.parametrize('score_dtype', SCORE_DTYPES)
+@pytest.mark.parametrize('n_items, start, k', [(600, 500, 20), (30, 20, 50)])
+def test_merge_neighbours_matches_a_rebuild(score_dtype, n_items, start, k):
+    matrix = tfidf_like(n_items).tocsr()
+    existing = quantise_neighbours(build_neighbour_table(matrix[:start], k=k, score_dtype='float32'), score_dtype)
+    merged, affected = merge_neighbours(existing, matrix, start, block_size=64)
+
+    rebuilt = quantise_neighbours(build_neighbour_table(matrix, k=k, score_dtype='float32'), score_dtype)[:start]
+    np.testing.assert_array_equal(merged['index'], rebuilt['index'])
+    np.testing.assert_array_equal(merged['score'], rebuilt['score'])
+    unchanged = np.setdiff1d(np.arange(start), affected)
+    np.testing.assert_array_equal(merged[unchanged], existing[unchanged])
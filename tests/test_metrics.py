@@ -0,0 +1,52 @@
+import asyncio
+
+from recommender.metrics import Metrics, combined_prometheus_text
+from recommender.server import RecommendationServer
+
+
+def served(metrics, domain, n_requests, match='exact'):
+    for _ in range(n_requests):
+        with metrics.request(domain) as request:
+            with request.span('match'):
+                request.match(match, 100)
+
+
+def sample(text, series):
+    return [float(line.rsplit(' ', 1)[1]) for line in text.splitlines() if line.startswith(series + ' ')]
+
+
+# The metrics of several processes add up, and the files of processes that exited keep counting:
+def test_combined_prometheus_text_sums_the_workers(tmp_path):
+    first, second = Metrics(), Metrics()
+    served(first, 'movies', 3)
+    served(second, 'movies', 2, match='fuzzy')
+    served(second, 'games', 1)
+    first.write_state(tmp_path / 'worker-1.json')
+    second.write_state(tmp_path / 'worker-2.json')
+
+    text = combined_prometheus_text([tmp_path / 'worker-1.json', tmp_path / 'worker-2.json', tmp_path / 'missing.json'])
+    assert sample(text, 'recommender_requests_total{domain="movies",outcome="ok"}') == [5]
+    assert sample(text, 'recommender_title_matches_total{domain="movies",match="fuzzy"}') == [2]
+    assert sample(text, 'recommender_request_seconds_count{domain="movies"}') == [5]
+    assert sample(text, 'recommender_stage_seconds_count{domain="games",stage="match"}') == [1]
+
+    single = Metrics()
+    served(single, 'movies', 3)
+    served(single, 'movies', 2, match='fuzzy')
+    served(single, 'games', 1)
+    assert [line for line in text.splitlines() if 'seconds' not in line] == \
+           [line for line in single.prometheus_text().splitlines() if 'seconds' not in line]
+
+
+def test_prefork_worker_reports_every_worker(tmp_path):
+    other = Metrics()
+    served(other, 'movies', 4)
+    other.write_state(tmp_path / 'worker-0.json')
+
+    metrics = Metrics()
+    served(metrics, 'movies', 1)
+    server = RecommendationServer({}, workers=1, metrics=metrics, metrics_dir=str(tmp_path))
+    status, text, _ = asyncio.run(server.dispatch('GET', '/metrics', b''))
+    server.executor.shutdown()
+    assert status == 200
+    assert sample(text, 'recommender_requests_total{domain="movies",outcome="ok"}') == [5]
@@ -0,0 +1,25 @@
+from recommender import preprocess
+
+
+class Lemmatizer:
+    def lemmatize(self, word):
+        return word[:-1] if word.endswith('s') else word
+
+
+# The text tools (and any nltk download) are loaded once in the parent, not by every pool worker:
+def test_text_tools_load_once_before_the_pool(monkeypatch):
+    loads = []
+
+    def load_text_tools():
+        loads.append(1)
+        return {'the', 'a'}, Lemmatizer(), str.split
+
+    monkeypatch.setattr(preprocess, 'load_text_tools', load_text_tools)
+    preprocess.process_text_tools.cache_clear()
+    try:
+        texts = [f"the cats of chunk {i}" for i in range(3 * preprocess.CHUNK_SIZE)]
+        assert preprocess.clean_texts(texts, workers=2) == [f"cat of chunk {i}" for i in range(len(texts))]
+        assert preprocess.clean_texts(texts, workers=1) == preprocess.clean_texts(texts, workers=2)
+    finally:
+        preprocess.process_text_tools.cache_clear()
+    assert loads == [1]
@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+
+from recommender.build import run_stage, save_neighbours
+from recommender.quantise import SCORE_DTYPES, quantisation_report, quantise_neighbours
+from recommender.ranking import UINT8_SCORE_SCALE, build_neighbour_file, neighbour_scores
+
+# Largest error of a served score against the exact cosine similarity, per score dtype
+MAX_SCORE_ERROR = {'float32': 1e-7, 'float16': 2.0**-12, 'uint8': UINT8_SCORE_SCALE / 2 + 1e-7}
+
+
+# The artifact written by the build (index stage, then the write step) against the exact similarities:
+@pytest.mark.parametrize('score_dtype', SCORE_DTYPES)
+def test_built_neighbour_scores_are_quantised_once_from_the_exact_scores(matrix, tmp_path, score_dtype):
+    neighbours, _ = run_stage(str(tmp_path), 'index', build_neighbour_file, [matrix], {'k': 10, 'score_dtype': 'float32'},
+                              'input', [], writes_file=True)
+    save_neighbours(str(tmp_path / 'neighbours.npy'), neighbours, score_dtype)
+    written = np.load(tmp_path / 'neighbours.npy')
+    assert written['score'].dtype == np.dtype(score_dtype)
+
+    exact = np.take_along_axis((matrix @ matrix.T).toarray(), written['index'].astype(np.intp), axis=1)
+    assert np.abs(neighbour_scores(written) - exact).max() <= MAX_SCORE_ERROR[score_dtype]
+    full_precision = exact.astype(np.float32)
+    if score_dtype == 'uint8':
+        np.testing.assert_array_equal(written['score'], np.rint(full_precision.astype(np.float64) / UINT8_SCORE_SCALE))
+    else:
+        np.testing.assert_array_equal(written['score'], full_precision.astype(score_dtype))
+
+
+def test_quantised_scores_keep_the_stored_order(matrix, tmp_path):
+    neighbours = build_neighbour_file(matrix, str(tmp_path / 'index.npy'), k=10, score_dtype='float32')
+    for dtype in SCORE_DTYPES:
+        quantised = quantise_neighbours(neighbours, dtype)
+        np.testing.assert_array_equal(quantised['index'], neighbours['index'])
+
+
+def test_quantisation_report_measures_the_served_scores(matrix):
+    report = quantisation_report(matrix, k=10, sample_size=200)
+    assert report['items'] == 200
+    for dtype in SCORE_DTYPES:
+        assert 0 <= report['scores'][dtype]['mean_error'] <= report['scores'][dtype]['max_error'] <= MAX_SCORE_ERROR[dtype]
+    assert report['scores']['float16']['max_error'] > 0
+    assert report['tfidf']['float64'] == 0
@@ -0,0 +1,90 @@
+import tracemalloc
+
+import numpy as np
+import pytest
+
+from conftest import tfidf_like
+from recommender import ranking
+from recommender.ranking import (NEIGHBOURS_DTYPE, PADDING_INDEX, build_neighbour_table, similarity_row,
+                                 top_n_indices, top_n_rows, top_neighbours)
+
+
+# Traced peak (MB) of building the neighbour table of an N-item matrix into a preallocated table:
+def build_peak_mb(n_items, workers):
+    matrix = tfidf_like(n_items, n_terms=2000, density=0.01).tocsr()
+    out = np.empty((n_items, 50), dtype=NEIGHBOURS_DTYPE)
+    tracemalloc.start()
+    try:
+        build_neighbour_table(matrix, out=out, workers=workers)
+        return tracemalloc.get_traced_memory()[1] / 2**20
+    finally:
+        tracemalloc.stop()
+
+
+def test_build_peak_memory_is_set_by_the_block_budget(monkeypatch):
+    monkeypatch.setattr(ranking, 'BLOCK_MEMORY', 16 * 2**20)
+    # The dense N x N scores of the larger catalogue alone would be 200 MB
+    peaks = {(n_items, workers): build_peak_mb(n_items, workers) for n_items in [1000, 5000] for workers in [1, 4]}
+    assert max(peaks.values()) < 24, peaks
+    assert peaks[(5000, 4)] < peaks[(1000, 4)] + 8, peaks
+
+
+# Reference top-N: stable sort by descending score, so ties keep the lower index first
+def reference_top_n(scores, top_n, exclude=(), mask=None):
+    allowed = np.ones(len(scores), dtype=bool) if mask is None else mask.copy()
+    allowed[list(exclude)] = False
+    order = np.argsort(-np.asarray(scores, dtype=np.float64), kind='stable')
+    return order[allowed[order]][:top_n]
+
+
+def test_top_n_indices_matches_a_stable_sort():
+    rng = np.random.default_rng(0)
+    for _ in range(200):
+        n = int(rng.integers(1, 60))
+        scores = rng.integers(0, 5, n) / 4          # Many ties
+        top_n = int(rng.integers(1, n + 5))
+        exclude = rng.choice(n, int(rng.integers(0, 3)), replace=False)
+        mask = rng.random(n) < 0.7 if rng.random() < 0.5 else None
+        np.testing.assert_array_equal(top_n_indices(scores, top_n, exclude, mask),
+                                      reference_top_n(scores, top_n, exclude, mask))
+
+
+def test_top_n_rows_matches_a_stable_sort():
+    rng = np.random.default_rng(1)
+    scores = rng.integers(0, 4, (40, 30)) / 3
+    exclude = rng.integers(-1, 30, 40)
+    for top_n in [1, 5, 29, 40]:
+        top, top_scores = top_n_rows(scores, top_n, exclude=exclude)
+        for r in range(len(scores)):
+            expected = reference_top_n(scores[r], top_n, [exclude[r]] if exclude[r] >= 0 else [])
+            np.testing.assert_array_equal(top[r], expected)
+            np.testing.assert_array_equal(top_scores[r], scores[r, expected])
+
+
+def test_build_neighbour_table_matches_the_dense_result(matrix):
+    dense = (matrix @ matrix.T).toarray()
+    for block_size, workers in [(None, None), (7, 3)]:
+        neighbours = build_neighbour_table(matrix, k=20, block_size=block_size, workers=workers)
+        assert neighbours.dtype == NEIGHBOURS_DTYPE
+        for idx in range(matrix.shape[0]):
+            expected = reference_top_n(dense[idx], 20, [idx])
+            np.testing.assert_array_equal(neighbours['index'][idx], expected)
+            np.testing.assert_array_equal(neighbours['score'][idx], dense[idx, expected].astype(np.float16))
+
+
+def test_short_rows_are_padded_and_skipped():
+    matrix = tfidf_like(12).tocsr()
+    neighbours = build_neighbour_table(matrix, k=20)
+    assert np.all(neighbours['index'][:, 11:] == PADDING_INDEX)
+    assert np.all(neighbours['score'][:, 11:] == 0)
+    results = top_neighbours(neighbours, matrix, 0, 20)
+    assert [i for i, _ in results] == reference_top_n(similarity_row(matrix, 0), 11, [0]).tolist()
+    with pytest.raises(ValueError):
+        top_neighbours(neighbours, matrix, 0, 0)
+
+
+def test_filtered_neighbours_fall_back_to_the_similarity_row(matrix):
+    neighbours = build_neighbour_table(matrix, k=10)
+    mask = np.arange(matrix.shape[0]) % 5 == 0
+    results = top_neighbours(neighbours, matrix, 3, 10, mask=mask)
+    assert [i for i, _ in results] == reference_top_n(similarity_row(matrix, 3), 10, [3], mask).tolist()
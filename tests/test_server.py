@@ -0,0 +1,151 @@
+import asyncio
+import json
+
+import pandas as pd
+import pytest
+
+from recommender import server
+from recommender.engine import TitleNotFound
+from recommender.filters import build_filter_index
+from recommender.server import HTTPError, RecommendationServer
+
+
+# Stand-in for a loaded recommender: a small filter index, and recommend_title() / recommend_batch() echoing their
+# input ('missing' matches no title, 'broken' fails inside the engine)
+class StubRecommender:
+    def __init__(self):
+        items = pd.DataFrame({'genres': ['Action, Drama', 'Comedy', 'Drama'],
+                              'release_date': ['2010-01-01', '2015-06-01', '2020-03-01'],
+                              'rating': [7.5, 6.0, 8.1]})
+        self.filter_index = build_filter_index(items, {'genre': 'genres'})
+
+    def recommend_title(self, query, top_n, filters=None):
+        if query == 'missing':
+            raise TitleNotFound(f"Movie {query} is not updated in the data.")
+        if query == 'broken':
+            raise RuntimeError("the neighbour table is corrupt")
+        return [{'title': query, 'top_n': top_n, 'filters': filters}]
+
+    def recommend_batch(self, seeds, top_n):
+        return type('Batch', (), {'seeds': seeds, 'indices': [], 'scores': []})()
+
+
+@pytest.fixture
+def app():
+    app = RecommendationServer({'movies': StubRecommender()}, workers=1)
+    yield app
+    app.executor.shutdown()
+
+
+def read(app, data, eof=True):
+    async def run():
+        reader = asyncio.StreamReader()
+        reader.feed_data(data)
+        if eof:
+            reader.feed_eof()
+        return await app.read_request(reader)
+    return asyncio.run(run())
+
+
+def dispatch(app, method, target, body=None):
+    return asyncio.run(app.dispatch(method, target, json.dumps(body).encode() if body is not None else b''))
+
+
+def test_read_request(app):
+    body = b'{"q": "znmd"}'
+    method, target, version, headers, payload = read(
+        app, b'post /movies/recommend HTTP/1.1\r\nHost: x\r\nContent-Length: 13\r\n\r\n' + body)
+    assert (method, target, version, payload) == ('POST', '/movies/recommend', 'HTTP/1.1', body)
+    assert headers == {'host': 'x', 'content-length': '13'}
+    assert read(app, b'') is None
+
+
+@pytest.mark.parametrize('data, status', [
+    (b'GET /\r\n\r\n', 400),
+    (b'GET / HTTP/1.1\r\nContent-Length: ten\r\n\r\n', 400),
+    (b'GET / HTTP/1.1\r\nContent-Length: -1\r\n\r\n', 400),
+    (b'POST / HTTP/1.1\r\nContent-Length: %d\r\n\r\n' % (server.MAX_BODY_SIZE + 1), 413),
+    (b'GET / HTTP/1.1\r\n' + b'X-A: b\r\n' * (server.MAX_HEADERS + 1) + b'\r\n', 431),
+    (b'GET / HTTP/1.1\r\nX-A: ' + b'b' * server.MAX_LINE_SIZE + b'\r\n\r\n', 431),
+    (b'GET / HTTP/1.1\r\nX-A: ' + b'b' * 100000 + b'\r\n\r\n', 431),
+    (b'GET /' + b'a' * server.MAX_LINE_SIZE + b' HTTP/1.1\r\n\r\n', 414),
+])
+def test_read_request_rejects(app, data, status):
+    with pytest.raises(HTTPError) as error:
+        read(app, data)
+    assert error.value.status == status
+
+
+def test_slow_headers_time_out(app, monkeypatch):
+    monkeypatch.setattr(server, 'KEEP_ALIVE_TIMEOUT', 0.05)
+    with pytest.raises(asyncio.TimeoutError):
+        read(app, b'GET / HTTP/1.1\r\nHost: x\r\n', eof=False)
+
+
+def test_recommend(app):
+    status, payload, _ = dispatch(app, 'POST', '/movies/recommend',
+                                  {'q': 'znmd', 'top_n': 5, 'filters': {'genre': ['drama'], 'year_min': 2012}})
+    assert status == 200
+    assert payload['results'] == [{'title': 'znmd', 'top_n': 5, 'filters': {'genre': ['drama'], 'year_min': 2012}}]
+    assert dispatch(app, 'GET', '/movies/recommend?q=znmd&top_n=3')[1]['results'][0]['top_n'] == 3
+
+
+@pytest.mark.parametrize('method, target, body, status', [
+    ('GET', '/movies/recommend', None, 400),
+    ('GET', '/movies/recommend?q=znmd&top_n=0', None, 400),
+    ('GET', '/movies/recommend?q=znmd&top_n=many', None, 400),
+    ('GET', '/books/recommend?q=znmd', None, 404),
+    ('GET', '/movies/recommend?q=missing', None, 404),
+    ('PUT', '/movies/recommend', None, 405),
+    ('GET', '/batch', None, 405),
+    ('POST', '/movies/recommend', ['znmd'], 400),
+    ('POST', '/movies/recommend', {'q': 'znmd', 'filters': ['drama']}, 400),
+    ('POST', '/movies/recommend', {'q': 'znmd', 'filters': {'mood': 'happy'}}, 400),
+    ('POST', '/movies/recommend', {'q': 'znmd', 'filters': {'genre': 3}}, 400),
+    ('POST', '/movies/recommend', {'q': 'znmd', 'filters': {'genre': ['drama', {'a': 1}]}}, 400),
+    ('POST', '/movies/recommend', {'q': 'znmd', 'filters': {'year_min': '2015'}}, 400),
+    ('POST', '/movies/recommend', {'q': 'znmd', 'filters': {'min_rating': True}}, 400),
+    ('POST', '/batch', {'seeds': ['znmd', True]}, 400),
+    ('POST', '/batch', {'seeds': 'znmd'}, 400),
+])
+def test_dispatch_rejects(app, method, target, body, status):
+    with pytest.raises(HTTPError) as error:
+        dispatch(app, method, target, body)
+    assert error.value.status == status
+
+
+def test_bad_filter_message(app):
+    with pytest.raises(HTTPError, match="Filter 'year_min' takes a number"):
+        dispatch(app, 'POST', '/movies/recommend', {'q': 'znmd', 'filters': {'year_min': '2015'}})
+
+
+def test_batch_accepts_titles_and_row_ids(app):
+    status, payload, _ = dispatch(app, 'POST', '/batch', {'seeds': ['znmd', 42], 'top_n': 5})
+    assert status == 200 and payload['seeds'] == ['znmd', 42]
+
+
+# Failures inside the engine are internal errors, not a missing title:
+def test_engine_failures_are_500(app):
+    async def run():
+        reader = asyncio.StreamReader()
+        reader.feed_data(b'GET /movies/recommend?q=broken HTTP/1.1\r\nConnection: close\r\n\r\n')
+        reader.feed_eof()
+        writer = RecordingWriter()
+        await app.handle_connection(reader, writer)
+        return bytes(writer.data)
+    response = asyncio.run(run())
+    assert response.startswith(b'HTTP/1.1 500 ') and b'the neighbour table is corrupt' in response
+
+
+class RecordingWriter:
+    def __init__(self):
+        self.data = bytearray()
+
+    def write(self, data):
+        self.data += data
+
+    async def drain(self):
+        pass
+
+    def close(self):
+        pass
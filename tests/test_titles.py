@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+from rapidfuzz import fuzz, process
+
+from recommender.titles import build_title_index, clean_title, match_title
+
+WORDS = ['the', 'dark', 'night', 'sincere', 'ring', 'war', 'love', 'story', 'king', 'lost', 'city', 'star',
+         'man', 'house', 'dream', 'blue', 'river', 'game', 'life', 'road', 'zindagi', 'na', 'milegi', 'dobara']
+
+
+@pytest.fixture(scope='module')
+def title_index():
+    rng = np.random.default_rng(0)
+    titles = [' '.join(rng.choice(WORDS, int(rng.integers(1, 5)))) for _ in range(3000)] + ['sincere', 'zindagi na milegi dobara']
+    years = [f"{year}-01-01" for year in rng.integers(1950, 2024, len(titles))]
+    return build_title_index(titles, years, {'znmd': 'zindagi na milegi dobara'})
+
+
+def misspell(title, rng):
+    letters = list(title)
+    position = int(rng.integers(0, len(letters)))
+    letters[position] = str(rng.choice(list('abcdefghijklmnopqrstuvwxyz')))
+    return ''.join(letters)
+
+
+# match_title returns the match of a full extractOne over every title (first title in catalogue order on ties):
+def test_match_title_matches_a_full_extract_one(title_index):
+    rng = np.random.default_rng(1)
+    choices = title_index['choices']
+    queries = ['skinqeri', 'sincere', 'the dakr night', 'xq', 'zzzzzzzzzzzz', 'river road of the lost king']
+    queries += [misspell(choices[int(rng.integers(0, len(choices)))], rng) for _ in range(300)]
+    for query in queries:
+        expected = process.extractOne(query, choices, scorer=fuzz.ratio)
+        row, title, score = match_title(title_index, query)
+        assert (title, score) == (expected[0], expected[1]), query
+        assert row == title_index['rows'][expected[2]], query
+
+
+def test_exact_titles_and_aliases(title_index):
+    # Duplicated titles resolve to their first row, or to the row of the year given after the title
+    first_row = title_index['exact']['sincere']
+    assert first_row < 3000 and match_title(title_index, 'sincere') == (first_row, 'sincere', 100.0)
+    year_keys = [key for key in title_index['exact'] if key[:-5] == 'sincere']
+    assert year_keys and all(match_title(title_index, key)[0] == title_index['exact'][key] for key in year_keys)
+
+    query = clean_title('ZNMD ')
+    assert match_title(title_index, title_index['aliases'].get(query, query)) == (3001, 'zindagi na milegi dobara', 100.0)